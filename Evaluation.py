@@ -1,11 +1,15 @@
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer, util
+import os
+import numpy as np
+import model_registry
+import tracing
+from judge_cache import make_key, score_cache
 
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-faithfulness_model_1 = pipeline("text2text-generation", model="google/flan-t5-base")
-faithfulness_model_2 = pipeline("text2text-generation", model="google/flan-t5-large")
+embedding_model = model_registry.sentence_model("all-MiniLM-L6-v2")
+faithfulness_model_1 = model_registry.pipeline("text2text-generation", "google/flan-t5-base")
+faithfulness_model_2 = model_registry.pipeline("text2text-generation", "google/flan-t5-large")
 
-def parse_llm_score(response):
+def _find_score(response):
+    """First number in [-1, 1] in response, or None if there is none."""
     try:
         for token in response.split():
             try:
@@ -16,124 +20,395 @@ def parse_llm_score(response):
                 continue
     except Exception:
         pass
-    return 0.0
+    return None
+
+def parse_llm_score(response):
+    score = _find_score(response)
+    return 0.0 if score is None else score
 
 def evaluate(question, answer, context):
     max_context_length = 1000
     if len(context) > max_context_length:
         context = context[:max_context_length] + "..."
 
-    emb_q = embedding_model.encode(question, convert_to_tensor=True)
-    emb_a = embedding_model.encode(answer, convert_to_tensor=True)
-    emb_c = embedding_model.encode(context, convert_to_tensor=True)
+    emb_q, emb_a, emb_c = _normalized_embeddings([question, answer, context])
 
-    question_answer_sim = util.cos_sim(emb_q, emb_a).item()
-    answer_context_sim = util.cos_sim(emb_a, emb_c).item()
+    question_answer_sim = float(emb_q @ emb_a)
+    answer_context_sim = float(emb_a @ emb_c)
 
     prompt = (
         f"Context:\n{context}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
         "On scale from -1 (-1 being absolutly tragic) to 1 (1 being perfect), how good is this answer to the question based on the context? "
     )
-    llm_response_1 = faithfulness_model_1(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    llm_response_2 = faithfulness_model_2(prompt, max_new_tokens=10)[0]['generated_text'].strip()
+    return judge_prompts([prompt], 10)[0]
+
+MAX_CONTEXT_LENGTH = 1000
+
+# Judge prompt variants: instruction appended after the context block and the
+# number of new tokens each judge model may generate for it.
+VARIANTS = {
+    "vanilla": (
+        "On scale from -1 (-1 being absolutely tragic) to 1 (1 being perfect), how good is this answer to the question based on the context?",
+        10,
+    ),
+    "cannotanswer_explicit": (
+        "On scale from -1 (absolutely tragic) to 1 (perfect), rate the answer's quality based on the context. "
+        "If the answer is 'CANNOTANSWER', rate it highly if the context truly does not contain the answer.",
+        10,
+    ),
+    "shorter_scale": (
+        "Rate the answer from -1 (bad) to 1 (good) based only on the information in the context.",
+        10,
+    ),
+    "explanation": (
+        "First, explain if the answer is supported by the context. Then, rate from -1 (not supported) to 1 (fully supported).",
+        30,
+    ),
+    "binary": (
+        "Is the answer correct based on the context? Reply with 1 for correct, -1 for incorrect.",
+        5,
+    ),
+}
+
+def clip_context(context):
+    if len(context) > MAX_CONTEXT_LENGTH:
+        context = context[:MAX_CONTEXT_LENGTH] + "..."
+    return context
+
+def prompt_header(question, answer, context):
+    return f"Context:\n{clip_context(context)}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
+
+def build_prompt(variant, question, answer, context, header=None):
+    instruction, _ = VARIANTS[variant]
+    if header is None:
+        header = prompt_header(question, answer, context)
+    return header + instruction
+
+# Judge modes: "generate" decodes free text and parses the first score in it;
+# "logits" runs one encoder pass and one teacher-forced decoder pass over the
+# SCORE_GRID values and returns their probability-weighted mean, so it never
+# falls back to 0.0 on unparseable text.
+JUDGE_MODE = os.environ.get("JUDGE_MODE", "generate")
+SCORE_GRID = (-1.0, 0.0, 1.0)
+
+def _judge_outputs(judge, prompts, limits, batch_size, mode):
+    """(score, confidence) per prompt.
+
+    score is None when a generated answer holds no parseable score;
+    confidence is the probability of the most likely grid value in "logits"
+    mode and None in "generate" mode.
+    """
+    tokens = None
+    if tracing.active():
+        tokens = tracing.count_tokens(getattr(judge, "tokenizer", None), prompts)
+    with tracing.span(f"judge:{judge.model_id}", tokens):
+        if mode == "logits":
+            return [
+                (sum(p * value for p, value in zip(probs, SCORE_GRID)), max(probs))
+                for probs in judge.grid_probabilities(prompts, SCORE_GRID, batch_size)
+            ]
+        return [(_find_score(response), None) for response in judge.generate(prompts, limits, batch_size)]
+
+def _judge_scores(judge, prompts, limits, batch_size, mode):
+    return [0.0 if score is None else score
+            for score, _ in _judge_outputs(judge, prompts, limits, batch_size, mode)]
+
+# Judge strategies: "both" averages FLAN-T5-base and FLAN-T5-large on every
+# prompt; "cascade" runs base first and asks large only when CASCADE_RULE
+# finds the base output uncertain, averaging the two for those prompts.
+JUDGE_STRATEGY = os.environ.get("JUDGE_STRATEGY", "both")
+# Escalate when the base output has no score (unparseable), when its score
+# is within near_zero of 0, or, in "logits" mode, when its most likely grid
+# value has probability below min_confidence.
+CASCADE_RULE = {"unparseable": True, "near_zero": 0.2, "min_confidence": 0.6}
+cascade_stats = {"base_only": 0, "escalated": 0}
+
+def needs_large_judge(score, confidence, rule=None):
+    rule = rule or CASCADE_RULE
+    if score is None:
+        if rule["unparseable"]:
+            return True
+        score = 0.0
+    if abs(score) < rule["near_zero"]:
+        return True
+    return confidence is not None and confidence < rule["min_confidence"]
+
+def _cascade(base_outputs, large_score, rule=None):
+    """Cascaded scores from base outputs; large_score(indices) judges the escalated ones."""
+    escalate = [i for i, (score, confidence) in enumerate(base_outputs)
+                if needs_large_judge(score, confidence, rule)]
+    scores = [0.0 if score is None else score for score, _ in base_outputs]
+    if escalate:
+        for i, score_2 in zip(escalate, large_score(escalate)):
+            scores[i] = (scores[i] + score_2) / 2
+    return [round(score, 3) for score in scores], escalate
+
+def _score_key(prompt, max_new_tokens, mode="generate", strategy="both"):
+    model_ids = [faithfulness_model_1.model_id, faithfulness_model_2.model_id]
+    # fp32 keys stay unchanged so existing caches remain valid.
+    if model_registry.backend() != model_registry.FP32:
+        model_ids.append(model_registry.backend())
+    if mode == "logits":
+        parts = ["judge-logits", *model_ids, list(SCORE_GRID)]
+    else:
+        parts = ["judge", *model_ids, max_new_tokens]
+    if strategy == "cascade":
+        parts += ["cascade", sorted(CASCADE_RULE.items())]
+    return make_key(*parts, prompt)
+
+def judge_prompts(prompts, max_new_tokens, batch_size=1, mode=None, strategy=None):
+    """Scores prompts with the judge models, one padded batch per model.
 
-    score_1 = parse_llm_score(llm_response_1)
-    score_2 = parse_llm_score(llm_response_2)
-    avg_faithfulness = (score_1 + score_2) / 2
+    max_new_tokens is either one limit for every prompt or a list with one
+    limit per prompt; it is ignored in "logits" mode. mode defaults to
+    JUDGE_MODE and strategy to JUDGE_STRATEGY. Scores already in
+    score_cache are reused; only the misses are computed.
+    """
+    mode = mode or JUDGE_MODE
+    strategy = strategy or JUDGE_STRATEGY
+    if isinstance(max_new_tokens, int):
+        max_new_tokens = [max_new_tokens] * len(prompts)
+    keys = [_score_key(prompt, limit, mode, strategy) for prompt, limit in zip(prompts, max_new_tokens)]
+    scores = [score_cache.get(key) for key in keys]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    if not missing:
+        return scores
+    pending = [prompts[i] for i in missing]
+    limits = [max_new_tokens[i] for i in missing]
+    if mode not in ("logits", "generate"):
+        raise ValueError(f"Unknown judge mode: {mode}")
+    if strategy == "cascade":
+        base_outputs = _judge_outputs(faithfulness_model_1, pending, limits, batch_size, mode)
+        computed, escalated = _cascade(base_outputs, lambda indices: _judge_scores(
+            faithfulness_model_2, [pending[j] for j in indices], [limits[j] for j in indices],
+            batch_size, mode))
+        cascade_stats["escalated"] += len(escalated)
+        cascade_stats["base_only"] += len(pending) - len(escalated)
+    elif strategy == "both":
+        scores_1 = _judge_scores(faithfulness_model_1, pending, limits, batch_size, mode)
+        scores_2 = _judge_scores(faithfulness_model_2, pending, limits, batch_size, mode)
+        computed = [round((score_1 + score_2) / 2, 3) for score_1, score_2 in zip(scores_1, scores_2)]
+    else:
+        raise ValueError(f"Unknown judge strategy: {strategy}")
+    for i, score in zip(missing, computed):
+        scores[i] = score
+    score_cache.put_many((keys[i], scores[i]) for i in missing)
+    return scores
+
+def evaluate_variant(variant, question, answer, context, mode=None):
+    _, max_new_tokens = VARIANTS[variant]
+    prompt = build_prompt(variant, question, answer, context)
+    return judge_prompts([prompt], max_new_tokens, mode=mode)[0]
 
-    return round(avg_faithfulness, 3)
+def evaluate_variant_batch(variant, questions, answers, contexts, batch_size=8, mode=None):
+    _, max_new_tokens = VARIANTS[variant]
+    prompts = [
+        build_prompt(variant, question, answer, context)
+        for question, answer, context in zip(questions, answers, contexts)
+    ]
+    return judge_prompts(prompts, max_new_tokens, batch_size=batch_size, mode=mode)
 
 def evaluate_vanilla(question, answer, context):
-    max_context_length = 1000
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "..."
-    prompt = (
-        f"Context:\n{context}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
-        "On scale from -1 (-1 being absolutely tragic) to 1 (1 being perfect), how good is this answer to the question based on the context?"
-    )
-    llm_response_1 = faithfulness_model_1(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    llm_response_2 = faithfulness_model_2(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    score_1 = parse_llm_score(llm_response_1)
-    score_2 = parse_llm_score(llm_response_2)
-    avg_faithfulness = (score_1 + score_2) / 2
-    return round(avg_faithfulness, 3)
+    return evaluate_variant("vanilla", question, answer, context)
 
 def evaluate_cannotanswer_explicit(question, answer, context):
-    max_context_length = 1000
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "..."
-    prompt = (
-        f"Context:\n{context}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
-        "On scale from -1 (absolutely tragic) to 1 (perfect), rate the answer's quality based on the context. "
-        "If the answer is 'CANNOTANSWER', rate it highly if the context truly does not contain the answer."
-    )
-    llm_response_1 = faithfulness_model_1(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    llm_response_2 = faithfulness_model_2(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    score_1 = parse_llm_score(llm_response_1)
-    score_2 = parse_llm_score(llm_response_2)
-    avg_faithfulness = (score_1 + score_2) / 2
-    return round(avg_faithfulness, 3)
+    return evaluate_variant("cannotanswer_explicit", question, answer, context)
 
 def evaluate_shorter_scale(question, answer, context):
-    max_context_length = 1000
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "..."
-    prompt = (
-        f"Context:\n{context}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
-        "Rate the answer from -1 (bad) to 1 (good) based only on the information in the context."
-    )
-    llm_response_1 = faithfulness_model_1(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    llm_response_2 = faithfulness_model_2(prompt, max_new_tokens=10)[0]['generated_text'].strip()
-    score_1 = parse_llm_score(llm_response_1)
-    score_2 = parse_llm_score(llm_response_2)
-    avg_faithfulness = (score_1 + score_2) / 2
-    return round(avg_faithfulness, 3)
+    return evaluate_variant("shorter_scale", question, answer, context)
 
 def evaluate_explanation(question, answer, context):
-    max_context_length = 1000
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "..."
-    prompt = (
-        f"Context:\n{context}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
-        "First, explain if the answer is supported by the context. Then, rate from -1 (not supported) to 1 (fully supported)."
-    )
-    llm_response_1 = faithfulness_model_1(prompt, max_new_tokens=30)[0]['generated_text'].strip()
-    llm_response_2 = faithfulness_model_2(prompt, max_new_tokens=30)[0]['generated_text'].strip()
-    score_1 = parse_llm_score(llm_response_1)
-    score_2 = parse_llm_score(llm_response_2)
-    avg_faithfulness = (score_1 + score_2) / 2
-    return round(avg_faithfulness, 3)
+    return evaluate_variant("explanation", question, answer, context)
 
 def evaluate_binary(question, answer, context):
-    max_context_length = 1000
-    if len(context) > max_context_length:
-        context = context[:max_context_length] + "..."
-    prompt = (
-        f"Context:\n{context}\n\nQuestion: {question}\nAnswer: {answer}\n\n"
-        "Is the answer correct based on the context? Reply with 1 for correct, -1 for incorrect."
-    )
-    llm_response_1 = faithfulness_model_1(prompt, max_new_tokens=5)[0]['generated_text'].strip()
-    llm_response_2 = faithfulness_model_2(prompt, max_new_tokens=5)[0]['generated_text'].strip()
-    score_1 = parse_llm_score(llm_response_1)
-    score_2 = parse_llm_score(llm_response_2)
-    avg_faithfulness = (score_1 + score_2) / 2
-    return round(avg_faithfulness, 3)
+    return evaluate_variant("binary", question, answer, context)
+
+AVERAGE_VARIANTS = ["vanilla", "cannotanswer_explicit", "shorter_scale", "explanation", "binary"]
+
+def evaluate_variants_batch(questions, answers, contexts, variants=AVERAGE_VARIANTS, batch_size=8, mode=None):
+    """Scores every variant for every sample with one batched call per judge model.
+
+    Returns one {variant: score} dict per sample, in input order.
+    """
+    prompts = []
+    limits = []
+    for question, answer, context in zip(questions, answers, contexts):
+        header = prompt_header(question, answer, context)
+        for variant in variants:
+            prompts.append(build_prompt(variant, question, answer, context, header=header))
+            limits.append(VARIANTS[variant][1])
+    scores = judge_prompts(prompts, limits, batch_size=batch_size, mode=mode)
+    n = len(variants)
+    return [dict(zip(variants, scores[i:i + n])) for i in range(0, len(scores), n)]
+
+def evaluate_variants(question, answer, context, variants=AVERAGE_VARIANTS, batch_size=8, mode=None):
+    return evaluate_variants_batch([question], [answer], [context], variants, batch_size, mode)[0]
 
 def evaluate_average(question, answer, context):
-    scores = [
-        evaluate_vanilla(question, answer, context),
-        evaluate_cannotanswer_explicit(question, answer, context),
-        evaluate_shorter_scale(question, answer, context),
-        evaluate_explanation(question, answer, context),
-        evaluate_binary(question, answer, context),
-    ]
+    scores = list(evaluate_variants(question, answer, context).values())
     avg = sum(scores) / len(scores)
     return round(avg, 3)
 
-def Evaluate(question, answer, context):
+def hybrid_variant(answer):
     if answer.strip().upper() == "CANNOTANSWER":
-        return evaluate_cannotanswer_explicit(question, answer, context)
+        return "cannotanswer_explicit"
+    return "shorter_scale"
+
+def Evaluate(question, answer, context, trace=None):
+    with tracing.request(trace):
+        return evaluate_variant(hybrid_variant(answer), question, answer, context)
+
+def _hybrid_prompts(questions, answers, contexts):
+    variants = [hybrid_variant(answer) for answer in answers]
+    prompts = [
+        build_prompt(variant, question, answer, context)
+        for variant, question, answer, context in zip(variants, questions, answers, contexts)
+    ]
+    return prompts, [VARIANTS[variant][1] for variant in variants]
+
+def Evaluate_batch(questions, answers, contexts, batch_size=8, mode=None):
+    """Batched Evaluate: returns one score per (question, answer, context), in input order.
+
+    Samples judged with different variants still share one batch per judge model.
+    """
+    prompts, limits = _hybrid_prompts(questions, answers, contexts)
+    return judge_prompts(prompts, limits, batch_size=batch_size, mode=mode)
+
+def Evaluate_candidates(question, answers, context, batch_size=8, mode=None):
+    """Evaluate for several candidate answers to one question over one context.
+
+    All candidates are judged in a single batched pass per judge model;
+    returns one score per candidate, in input order.
+    """
+    n = len(answers)
+    return Evaluate_batch([question] * n, answers, [context] * n, batch_size=batch_size, mode=mode)
+
+# Fast judge tier: a linear map of the MiniLM question-answer and
+# answer-context cosine similarities onto the [-1, 1] judge scale,
+# (weight_qa, weight_ac, bias). Unset until calibrate_embedding_judge has
+# been run on judged samples; until then every sample is escalated.
+EMBEDDING_CALIBRATION = None
+# Fast scores strictly inside this band are escalated to the FLAN judges.
+ESCALATION_BAND = (-0.5, 0.5)
+tier_stats = {"fast": 0, "escalated": 0}
+
+def _normalized_embeddings(texts):
+    unique = list(dict.fromkeys(texts))
+    vectors = embedding_model.embed(unique)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    rows = {text: i for i, text in enumerate(unique)}
+    return vectors[[rows[text] for text in texts]]
+
+def embedding_similarities(questions, answers, contexts):
+    """Question-answer and answer-context cosine similarities, from one encode call."""
+    n = len(answers)
+    contexts = [clip_context(context) for context in contexts]
+    vectors = _normalized_embeddings(list(questions) + list(answers) + contexts)
+    emb_q, emb_a, emb_c = vectors[:n], vectors[n:2 * n], vectors[2 * n:]
+    return (emb_q * emb_a).sum(-1), (emb_a * emb_c).sum(-1)
+
+def embedding_scores(questions, answers, contexts, calibration=None):
+    calibration = calibration or EMBEDDING_CALIBRATION
+    if calibration is None:
+        raise ValueError("the embedding judge is uncalibrated; run calibrate_embedding_judge first")
+    weight_qa, weight_ac, bias = calibration
+    question_answer_sim, answer_context_sim = embedding_similarities(questions, answers, contexts)
+    scores = np.clip(weight_qa * question_answer_sim + weight_ac * answer_context_sim + bias, -1.0, 1.0)
+    return [round(float(score), 3) for score in scores]
+
+def calibrate_embedding_judge(questions, answers, contexts, judge_scores=None, batch_size=8):
+    """Least-squares fit of EMBEDDING_CALIBRATION against the full judge.
+
+    judge_scores defaults to Evaluate_batch on the same samples. The fitted
+    (weight_qa, weight_ac, bias) is installed and returned.
+    """
+    global EMBEDDING_CALIBRATION
+    if judge_scores is None:
+        judge_scores = Evaluate_batch(questions, answers, contexts, batch_size=batch_size)
+    question_answer_sim, answer_context_sim = embedding_similarities(questions, answers, contexts)
+    features = np.stack([question_answer_sim, answer_context_sim, np.ones(len(answers))], axis=1)
+    solution, *_ = np.linalg.lstsq(features, np.asarray(judge_scores, dtype=np.float64), rcond=None)
+    EMBEDDING_CALIBRATION = tuple(float(value) for value in solution)
+    return EMBEDDING_CALIBRATION
+
+def evaluate_tiered_batch(questions, answers, contexts, band=None, batch_size=8, mode=None):
+    """Scores with the embedding tier and escalates uncertain samples to Evaluate_batch.
+
+    A sample is escalated when its fast score lies strictly inside band, or
+    when the answer is CANNOTANSWER, which similarity cannot judge. Without
+    EMBEDDING_CALIBRATION every sample is escalated.
+    Returns (scores, escalated flags), in input order.
+    """
+    low, high = band or ESCALATION_BAND
+    if EMBEDDING_CALIBRATION is None:
+        scores = [None] * len(answers)
+        escalate = list(range(len(answers)))
     else:
-        return evaluate_shorter_scale(question, answer, context)
+        with tracing.span("judge:embedding", len(answers)):
+            scores = embedding_scores(questions, answers, contexts)
+        escalate = [
+            i for i, (answer, score) in enumerate(zip(answers, scores))
+            if low < score < high or hybrid_variant(answer) == "cannotanswer_explicit"
+        ]
+    if escalate:
+        full = Evaluate_batch(
+            [questions[i] for i in escalate],
+            [answers[i] for i in escalate],
+            [contexts[i] for i in escalate],
+            batch_size=batch_size,
+            mode=mode,
+        )
+        for i, score in zip(escalate, full):
+            scores[i] = score
+    tier_stats["escalated"] += len(escalate)
+    tier_stats["fast"] += len(answers) - len(escalate)
+    escalated = [False] * len(answers)
+    for i in escalate:
+        escalated[i] = True
+    return scores, escalated
+
+def Evaluate_tiered(question, answer, context, band=None):
+    return evaluate_tiered_batch([question], [answer], [context], band=band)[0][0]
+
+def tiered_judge_report(questions, answers, contexts, band=None, batch_size=8):
+    """Escalation rate of the tiered judge and its agreement with the full judge."""
+    tiered, escalated = evaluate_tiered_batch(questions, answers, contexts, band=band, batch_size=batch_size)
+    full = np.asarray(Evaluate_batch(questions, answers, contexts, batch_size=batch_size))
+    tiered = np.asarray(tiered)
+    fast = ~np.asarray(escalated)
+    return {
+        "samples": len(answers),
+        "escalation_rate": float(1 - fast.mean()) if len(answers) else 0.0,
+        "mae": float(np.abs(tiered - full).mean()) if len(answers) else 0.0,
+        "fast_mae": float(np.abs(tiered[fast] - full[fast]).mean()) if fast.any() else 0.0,
+        "sign_agreement": float((np.sign(tiered) == np.sign(full)).mean()) if len(answers) else 0.0,
+    }
 
+def judge_cascade_report(questions, answers, contexts, rules=None, batch_size=8, mode=None):
+    """Escalation rate and drift from the always-both average of the judge cascade.
 
+    Both judges run once on the hybrid prompts of the samples; the cascade
+    is then replayed for every rule in rules (default [CASCADE_RULE]), so
+    several rules can be compared for the cost of one always-both pass.
+    """
+    mode = mode or JUDGE_MODE
+    prompts, limits = _hybrid_prompts(questions, answers, contexts)
+    base_outputs = _judge_outputs(faithfulness_model_1, prompts, limits, batch_size, mode)
+    large = _judge_scores(faithfulness_model_2, prompts, limits, batch_size, mode)
+    base = [0.0 if score is None else score for score, _ in base_outputs]
+    both = np.asarray([round((b + l) / 2, 3) for b, l in zip(base, large)])
+    reports = []
+    for rule in rules or [CASCADE_RULE]:
+        cascaded, escalated = _cascade(base_outputs, lambda indices: [large[i] for i in indices], rule)
+        drift = np.abs(np.asarray(cascaded) - both)
+        reports.append({
+            "rule": dict(rule),
+            "samples": len(prompts),
+            "escalation_rate": len(escalated) / len(prompts) if prompts else 0.0,
+            "unparseable_rate": sum(score is None for score, _ in base_outputs) / len(prompts) if prompts else 0.0,
+            "mean_drift": float(drift.mean()) if prompts else 0.0,
+            "max_drift": float(drift.max()) if prompts else 0.0,
+            "sign_agreement": float((np.sign(cascaded) == np.sign(both)).mean()) if prompts else 0.0,
+        })
+    return reports
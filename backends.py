@@ -0,0 +1,236 @@
+"""
+Model backend interface.
+
+The candidate generators, answer_question and the judges only need three
+kinds of model, each defined here as a small interface:
+
+ExtractiveQA      answer(questions, contexts, batch_size)
+                  -> [(answer, confidence)]
+TextGenerator     generate(prompts, max_new_tokens, batch_size) -> [text]
+SentenceEmbedder  embed(texts) -> float32 array, one row per text
+
+model_registry loads the Transformers* implementations below, which wrap
+Hugging Face pipelines and SentenceTransformers. stand_ins.py implements
+the same interfaces with deterministic heuristics, so the same code runs
+offline without the weights. The interfaces are abstract, so a backend
+missing one of their methods fails when it is built.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+Limits = Union[int, Sequence[int]]
+
+# Errors a model raises on an input it cannot handle, such as an empty or
+# over-long context. Anything else is a bug and propagates.
+PREDICTION_ERRORS = (ValueError, RuntimeError)
+
+
+def expand_limits(max_new_tokens: Limits, n: int) -> List[int]:
+    if isinstance(max_new_tokens, int):
+        return [max_new_tokens] * n
+    return list(max_new_tokens)
+
+
+class ExtractiveQA(ABC):
+    """
+    Extracts the answer to a question from its context.
+    """
+    model_id = ''
+
+    @abstractmethod
+    def _predict(self, questions: List[str], contexts: List[str],
+                 batch_size: int) -> List[Tuple[str, float]]:
+        """
+        (answer, confidence) for each pair, in input order.
+        """
+
+    def answer(self, questions: List[str], contexts: List[str],
+               batch_size: int = 8) -> List[Tuple[str, Optional[float]]]:
+        """
+        (answer, confidence) for each pair, in input order. If the batch
+        fails with one of PREDICTION_ERRORS it is retried one pair at a
+        time, and pairs that fail again that way get ('CANNOTANSWER', None).
+        """
+        try:
+            return list(self._predict(questions, contexts, batch_size))
+        except PREDICTION_ERRORS:
+            results: List[Tuple[str, Optional[float]]] = []
+            for question, context in zip(questions, contexts):
+                try:
+                    results.extend(self._predict([question], [context], 1))
+                except PREDICTION_ERRORS:
+                    results.append(('CANNOTANSWER', None))
+            return results
+
+
+class TextGenerator(ABC):
+    """
+    Generates text from prompts with greedy decoding.
+    """
+    model_id = ''
+    tokenizer: Any = None
+
+    @abstractmethod
+    def generate(self, prompts: List[str], max_new_tokens: Limits,
+                 batch_size: int = 8) -> List[str]:
+        """
+        Stripped output text for each prompt. max_new_tokens is one limit
+        for every prompt or a list with one limit per prompt.
+        """
+
+    def grid_probabilities(self, prompts: List[str], grid: Sequence[float],
+                           batch_size: int = 8) -> List[List[float]]:
+        """
+        For each prompt, the probability of the model answering with each
+        value of grid, normalized over the grid.
+        """
+        raise NotImplementedError(
+            f'{type(self).__name__} cannot score a grid')
+
+
+class SentenceEmbedder(ABC):
+    """
+    Embeds texts as fixed-size vectors.
+    """
+    model_id = ''
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        float32 array with one row per text.
+        """
+
+
+def _as_list(outputs: Any) -> List[Any]:
+    # Pipelines unwrap the result when the batch holds a single input.
+    return outputs if isinstance(outputs, list) else [outputs]
+
+
+class TransformersQA(ExtractiveQA):
+    def __init__(self, pipe: Any, model_id: str = '') -> None:
+        self.pipe = pipe
+        self.model_id = model_id
+
+    @property
+    def model(self) -> Any:
+        return self.pipe.model
+
+    def _predict(self, questions: List[str], contexts: List[str],
+                 batch_size: int) -> List[Tuple[str, float]]:
+        predictions = _as_list(self.pipe(question=questions,
+                                         context=contexts,
+                                         batch_size=batch_size))
+        return [(p['answer'], p['score']) for p in predictions]
+
+
+class TransformersText2Text(TextGenerator):
+    def __init__(self, pipe: Any, model_id: str = '') -> None:
+        self.pipe = pipe
+        self.model_id = model_id
+
+    @property
+    def model(self) -> Any:
+        return self.pipe.model
+
+    @property
+    def tokenizer(self) -> Any:
+        return self.pipe.tokenizer
+
+    def generate(self, prompts: List[str], max_new_tokens: Limits,
+                 batch_size: int = 8) -> List[str]:
+        """
+        Greedy decoding is prefix-stable, so when the limits differ the
+        whole batch is generated once up to the largest limit and each row
+        is cut back to its own limit, which gives the same text as
+        separate calls.
+        """
+        limits = expand_limits(max_new_tokens, len(prompts))
+        if len(set(limits)) <= 1:
+            if not prompts:
+                return []
+            outputs = self.pipe(prompts, max_new_tokens=limits[0],
+                                batch_size=batch_size)
+            return [(o[0] if isinstance(o, list) else o)['generated_text']
+                    .strip() for o in outputs]
+        import torch
+
+        tokenizer = self.tokenizer
+        model = self.model
+        longest = max(limits)
+        texts = []
+        for start in range(0, len(prompts), batch_size):
+            inputs = tokenizer(prompts[start:start + batch_size],
+                               return_tensors='pt', padding=True)
+            inputs = inputs.to(model.device)
+            with torch.no_grad():
+                outputs = model.generate(**inputs, max_new_tokens=longest)
+            for row, limit in zip(outputs, limits[start:start + batch_size]):
+                # Position 0 holds the decoder start token.
+                text = tokenizer.decode(row[1:limit + 1],
+                                        skip_special_tokens=True,
+                                        clean_up_tokenization_spaces=False)
+                texts.append(text.strip())
+        return texts
+
+    def grid_probabilities(self, prompts: List[str], grid: Sequence[float],
+                           batch_size: int = 8) -> List[List[float]]:
+        """
+        One encoder pass per prompt and one teacher-forced decoder pass
+        over the grid values written as text.
+        """
+        import torch
+
+        tokenizer = self.tokenizer
+        model = self.model
+        n = len(grid)
+        labels = tokenizer([f'{value:g}' for value in grid],
+                           return_tensors='pt', padding=True).input_ids
+        labels = labels.to(model.device)
+        label_mask = labels != tokenizer.pad_token_id
+        probabilities = []
+        for start in range(0, len(prompts), batch_size):
+            inputs = tokenizer(prompts[start:start + batch_size],
+                               return_tensors='pt', padding=True)
+            inputs = inputs.to(model.device)
+            rows = inputs.input_ids.shape[0]
+            with torch.no_grad():
+                hidden = model.get_encoder()(**inputs).last_hidden_state
+                # Every grid value is scored against the same encoder output.
+                batch_labels = labels.repeat(rows, 1)
+                logits = model(
+                    encoder_outputs=(hidden.repeat_interleave(n, dim=0),),
+                    attention_mask=inputs.attention_mask.repeat_interleave(
+                        n, dim=0),
+                    decoder_input_ids=model.prepare_decoder_input_ids_from_labels(
+                        labels=batch_labels),
+                ).logits
+            token_log_probs = logits.log_softmax(-1).gather(
+                -1, batch_labels.unsqueeze(-1)).squeeze(-1)
+            sequence_log_probs = (token_log_probs
+                                  * label_mask.repeat(rows, 1)).sum(-1)
+            probabilities.extend(
+                sequence_log_probs.view(rows, n).softmax(-1).tolist())
+        return probabilities
+
+
+class SentenceTransformerEmbedder(SentenceEmbedder):
+    def __init__(self, model: Any, model_id: str = '') -> None:
+        self.model = model
+        self.model_id = model_id
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(list(texts)), dtype=np.float32)
+
+
+def wrap_pipeline(task: str, pipe: Any, model_id: str) -> Any:
+    """
+    The backend for a Hugging Face pipeline, or the pipeline itself for
+    tasks without one.
+    """
+    if task == 'question-answering':
+        return TransformersQA(pipe, model_id)
+    if task == 'text2text-generation':
+        return TransformersText2Text(pipe, model_id)
+    return pipe
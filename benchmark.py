@@ -0,0 +1,293 @@
+"""
+Benchmarks for the QA ensemble and the judge variants.
+
+Runs on a fixed slice of quac_simple_val.jsonl, either against the real
+models or, with --stand-ins, against the deterministic stand-ins from
+stand_ins.py. Reports p50/p95 latency per stage, answer_questions
+throughput at several batch sizes, startup time and peak RSS, and writes
+everything to a JSON file so runs can be compared across commits with
+--compare. --backend-report instead scores the slice on every backend in
+model_registry.BACKENDS and reports answer and score agreement with fp32.
+Each backend runs in its own interpreter so its peak RSS is its own.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import model_registry
+from dataset_io import iter_records
+from judge_cache import score_cache
+
+# Subprocesses run here so they can import the repo's modules.
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_slice(path: str, n_samples: int) -> List[Dict[str, str]]:
+    return [entry for _, entry in iter_records(path, stop=n_samples)]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * q
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def time_calls(fn: Callable[..., Any],
+               calls: List[Tuple[Any, ...]]) -> Dict[str, float]:
+    latencies = []
+    for args in calls:
+        started = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - started)
+    return {
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'calls': len(latencies),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure_import_time() -> float:
+    """
+    Seconds to import models.py in a fresh interpreter.
+    """
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import models'], cwd=HERE,
+                   check=True)
+    return time.perf_counter() - started
+
+
+@contextlib.contextmanager
+def score_cache_disabled() -> Iterator[None]:
+    # Cached scores would hide the judge cost.
+    enabled = score_cache.enabled
+    score_cache.enabled = False
+    try:
+        yield
+    finally:
+        score_cache.enabled = enabled
+
+
+def run_benchmark(dataset: str = 'quac_simple_val.jsonl',
+                  n_samples: int = 20,
+                  batch_sizes: Tuple[int, ...] = (1, 4, 8, 16),
+                  use_stand_ins: bool = False) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        'commit': git_commit(),
+        'stand_ins': use_stand_ins,
+        'n_samples': n_samples,
+        'startup': {'import_s': measure_import_time()},
+    }
+
+    import models
+    import Evaluation
+    if use_stand_ins:
+        import stand_ins
+        stand_ins.install()
+    started = time.perf_counter()
+    models.warm_up()
+    report['startup']['warm_up_s'] = time.perf_counter() - started
+
+    with score_cache_disabled():
+        samples = load_slice(dataset, n_samples)
+        pairs = [(s['context'], s['question']) for s in samples]
+
+        stages: Dict[str, Dict[str, float]] = {}
+        # Start cold so the timings include tokenizing each distinct context.
+        models.truncator.clear()
+        stages['truncate_context'] = time_calls(models.truncate_context,
+                                                pairs)
+        truncated = [(models.truncate_context(c, q), q) for c, q in pairs]
+        for name, generate in models.CANDIDATES:
+            stages[name] = time_calls(generate,
+                                      [(q, c) for c, q in truncated])
+        judged = [(q, models.roberta_answer(q, c), c) for c, q in truncated]
+        for variant in Evaluation.VARIANTS:
+            stages[f'evaluate_{variant}'] = time_calls(
+                getattr(Evaluation, f'evaluate_{variant}'), judged)
+        stages['evaluate_average'] = time_calls(Evaluation.evaluate_average,
+                                                judged)
+        stages['answer_question'] = time_calls(models.answer_question, pairs)
+        report['stages'] = stages
+
+        throughput = {}
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            models.answer_questions(pairs, batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+            throughput[str(batch_size)] = (len(pairs) / elapsed
+                                           if elapsed else 0.0)
+        report['answer_questions_samples_per_s'] = throughput
+        report['peak_rss_mb'] = peak_rss_mb()
+        report['loaded_models'] = [list(key)
+                                   for key in model_registry.loaded_models()]
+        report['residency'] = model_registry.residency()
+    return report
+
+
+def score_on_backend(backend: str, dataset: str, n_samples: int,
+                     batch_size: int) -> Dict[str, Any]:
+    """
+    Runs score_candidates on the slice under one backend in this process.
+    """
+    import models
+
+    model_registry.set_backend(backend)
+    samples = load_slice(dataset, n_samples)
+    pairs = [(s['context'], s['question']) for s in samples]
+    models.warm_up()
+    started = time.perf_counter()
+    with score_cache_disabled():
+        scored = models.score_candidates(pairs, batch_size)
+    return {'seconds': time.perf_counter() - started,
+            'peak_rss_mb': peak_rss_mb(),
+            'scored': scored}
+
+
+def _score_in_subprocess(backend: str, dataset: str, n_samples: int,
+                         batch_size: int) -> Dict[str, Any]:
+    # ru_maxrss never goes down, so every backend gets a fresh interpreter.
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, f'{backend}.json')
+        subprocess.run([sys.executable, os.path.join(HERE, 'benchmark.py'),
+                        '--score-backend', backend,
+                        '--dataset', os.path.abspath(dataset),
+                        '--samples', str(n_samples),
+                        '--batch-size', str(batch_size),
+                        '--output', output], cwd=HERE, check=True)
+        with open(output, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def backend_report(dataset: str = 'quac_simple_val.jsonl',
+                   n_samples: int = 50,
+                   batch_size: int = 8) -> Dict[str, Any]:
+    """
+    Runs score_candidates on the slice under each backend, each in its own
+    interpreter, and compares every candidate's answer and score, and the
+    chosen answer, with fp32.
+    """
+    import models
+
+    results: Dict[str, List[Dict[str, Tuple[str, float]]]] = {}
+    report: Dict[str, Any] = {'commit': git_commit(), 'backends': {}}
+    for backend in model_registry.BACKENDS:
+        run = _score_in_subprocess(backend, dataset, n_samples, batch_size)
+        results[backend] = run.pop('scored')
+        report['backends'][backend] = run
+    report['n_samples'] = len(results[model_registry.FP32])
+    reference = results[model_registry.FP32]
+    for backend, scored in results.items():
+        stats = report['backends'][backend]
+        for name, _ in models.CANDIDATES:
+            same = [a[name][0] == b[name][0] for a, b in zip(reference, scored)]
+            deltas = [abs(a[name][1] - b[name][1])
+                      for a, b in zip(reference, scored)]
+            stats[name] = {
+                'answer_agreement': sum(same) / len(same) if same else 0.0,
+                'mean_abs_score_delta': (sum(deltas) / len(deltas)
+                                         if deltas else 0.0),
+            }
+        winners = [max(a, key=lambda n: a[n][1])
+                   == max(b, key=lambda n: b[n][1])
+                   for a, b in zip(reference, scored)]
+        stats['winner_agreement'] = (sum(winners) / len(winners)
+                                     if winners else 0.0)
+    return report
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """
+    Prints per-stage p50 latency and throughput ratios between two runs.
+    """
+    print(f"{'stage':<35}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for stage, stats in current['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if before is None:
+            continue
+        ratio = stats['p50_ms'] / before['p50_ms'] if before['p50_ms'] else 0
+        print(f"{stage:<35}{before['p50_ms']:>12.2f}"
+              f"{stats['p50_ms']:>12.2f}{ratio:>8.2f}")
+    for batch_size, rate in current['answer_questions_samples_per_s'].items():
+        before = baseline.get('answer_questions_samples_per_s',
+                              {}).get(batch_size)
+        if before:
+            print(f"{'throughput @ ' + batch_size:<35}{before:>12.2f}"
+                  f"{rate:>12.2f}{rate / before:>8.2f}")
+    print(f"{'peak_rss_mb':<35}{baseline['peak_rss_mb']:>12.1f}"
+          f"{current['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dataset', default='quac_simple_val.jsonl')
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--batch-sizes', default='1,4,8,16')
+    parser.add_argument('--stand-ins', action='store_true')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'))
+    parser.add_argument('--backend-report', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--score-backend', choices=model_registry.BACKENDS,
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.score_backend:
+        result = score_on_backend(args.score_backend, args.dataset,
+                                  args.samples, args.batch_size)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+    elif args.backend_report:
+        result = backend_report(args.dataset, args.samples, args.batch_size)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        for backend, stats in result['backends'].items():
+            agreement = ', '.join(
+                f"{name} {stats[name]['answer_agreement']:.2f}"
+                for name in ('roberta', 'flan', 'bert'))
+            print(f"{backend:<6}{stats['seconds']:>8.2f} s"
+                  f"{stats['peak_rss_mb']:>9.1f} MB   "
+                  f"answers: {agreement}   "
+                  f"winner: {stats['winner_agreement']:.2f}")
+    elif args.compare:
+        with open(args.compare[0], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        compare(baseline, current)
+    else:
+        result = run_benchmark(
+            args.dataset, args.samples,
+            tuple(int(b) for b in args.batch_sizes.split(',')),
+            args.stand_ins)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        for stage, stats in result['stages'].items():
+            print(f"{stage:<35}p50 {stats['p50_ms']:>9.2f} ms"
+                  f"   p95 {stats['p95_ms']:>9.2f} ms")
+        print(f"throughput: {result['answer_questions_samples_per_s']}")
+        print(f"startup: {result['startup']}, "
+              f"peak RSS: {result['peak_rss_mb']:.1f} MB")
@@ -0,0 +1,100 @@
+"""
+Retrieval-based context selection.
+
+Long contexts are split into overlapping word windows, embedded with the
+MiniLM model the judges already use, and only the top-k windows most
+similar to the question are kept, in their original order. The QA models
+and the judges then see a short, relevant context instead of the first
+512 tokens of the passage.
+"""
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+import context_store
+from Evaluation import embedding_model
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+
+
+def chunk_spans(n_words: int,
+                chunk_words: int = CHUNK_WORDS,
+                overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    """
+    (start, end) word ranges of windows of chunk_words words that overlap
+    by overlap words.
+    """
+    if n_words <= chunk_words:
+        return [(0, n_words)]
+    step = max(1, chunk_words - overlap)
+    spans = []
+    for start in range(0, n_words, step):
+        spans.append((start, min(start + chunk_words, n_words)))
+        if start + chunk_words >= n_words:
+            break
+    return spans
+
+
+def chunk_context(context: str,
+                  chunk_words: int = CHUNK_WORDS,
+                  overlap: int = CHUNK_OVERLAP) -> List[str]:
+    words = context.split()
+    return [' '.join(words[start:end])
+            for start, end in chunk_spans(len(words), chunk_words, overlap)]
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+@lru_cache(maxsize=1024)
+def _chunk_embeddings(context: str, chunk_words: int,
+                      overlap: int) -> Tuple[List[str], np.ndarray]:
+    # QuAC asks many questions about the same context; embed it once.
+    chunks = chunk_context(context, chunk_words, overlap)
+    store = context_store.active_store()
+    if store is not None and store.chunking == (chunk_words, overlap):
+        stored = store.chunk_embeddings(context)
+        if stored is not None:
+            return chunks, stored
+    return chunks, _normalized(embedding_model.embed(chunks))
+
+
+def rank_chunks(context: str,
+                question: str,
+                chunk_words: int = CHUNK_WORDS,
+                overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, float]]:
+    """
+    Returns (chunk index, cosine similarity to the question) pairs, most
+    similar first.
+    """
+    chunks, vectors = _chunk_embeddings(context, chunk_words, overlap)
+    query = _normalized(embedding_model.embed([question]))[0]
+    similarities = vectors @ query
+    order = np.argsort(-similarities, kind='stable')
+    return [(int(i), float(similarities[i])) for i in order]
+
+
+def select_context(context: str,
+                   question: str,
+                   top_k: int = 3,
+                   chunk_words: int = CHUNK_WORDS,
+                   overlap: int = CHUNK_OVERLAP) -> str:
+    """
+    Keeps the words of the top_k chunks most similar to the question, in
+    their original order; overlapping chunks are merged rather than
+    repeated. Contexts with no more than top_k chunks are returned as is.
+    """
+    words = context.split()
+    spans = chunk_spans(len(words), chunk_words, overlap)
+    if len(spans) <= top_k:
+        return context
+    ranked = rank_chunks(context, question, chunk_words, overlap)
+    keep = [False] * len(words)
+    for index, _ in ranked[:top_k]:
+        start, end = spans[index]
+        keep[start:end] = [True] * (end - start)
+    return ' '.join(word for word, kept in zip(words, keep) if kept)
@@ -0,0 +1,199 @@
+"""
+Precomputed, memory-mapped store of per-context token offsets and MiniLM
+chunk embeddings.
+
+QuAC asks many questions about each passage, so quac_simple_val.jsonl
+repeats the same long context on many lines. build_store deduplicates the
+contexts of a dataset once, offline, and writes for each of them the token
+end offsets under every model's tokenizer, which is all truncation needs,
+and the normalized embeddings of its context_selection chunks. All of
+them are written as flat NumPy arrays with offset tables. ContextStore
+opens them with mmap_mode='r', so lookups return views into the files
+instead of copies, and worker processes share the pages.
+
+    python context_store.py quac_simple_val.jsonl quac_store/
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dataset_io import context_id, iter_contexts
+
+
+def _save_ragged(store_dir: str, name: str,
+                 rows: List[np.ndarray], dtype: type) -> None:
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(row) for row in rows])
+    if rows:
+        values = np.concatenate(rows).astype(dtype)
+    else:
+        values = np.zeros(0, dtype=dtype)
+    np.save(os.path.join(store_dir, f'{name}.npy'), values)
+    np.save(os.path.join(store_dir, f'{name}_offsets.npy'), offsets)
+
+
+def build_store(path: str, store_dir: str) -> Dict[str, int]:
+    """
+    Indexes every distinct context of a flat or normalized dataset into
+    store_dir. Returns the number of contexts read and of distinct ones.
+    """
+    import models
+    from context_selection import CHUNK_OVERLAP, CHUNK_WORDS, chunk_context
+    from Evaluation import embedding_model
+
+    os.makedirs(store_dir, exist_ok=True)
+    ids: List[str] = []
+    seen = set()
+    ends: Dict[str, List[np.ndarray]] = {name: [] for name in
+                                         models.MODEL_TOKENIZERS}
+    embeddings: List[np.ndarray] = []
+    lines = 0
+    for context in iter_contexts(path):
+        lines += 1
+        cid = context_id(context)
+        if cid in seen:
+            continue
+        seen.add(cid)
+        ids.append(cid)
+        for name, tokenizer in models.MODEL_TOKENIZERS.items():
+            encoding = tokenizer(context, add_special_tokens=False,
+                                 return_offsets_mapping=True)
+            ends[name].append(np.asarray(
+                [end for _, end in encoding['offset_mapping']],
+                dtype=np.int32))
+        vectors = embedding_model.embed(chunk_context(context))
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        embeddings.append(vectors / np.where(norms == 0, 1, norms))
+
+    for name in models.MODEL_TOKENIZERS:
+        _save_ragged(store_dir, f'token_ends_{name}', ends[name], np.int32)
+    dimensions = embeddings[0].shape[1] if embeddings else 0
+    _save_ragged(store_dir, 'embeddings',
+                 [e.reshape(-1) for e in embeddings], np.float32)
+    with open(os.path.join(store_dir, 'index.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump({
+            'ids': ids,
+            'tokenizers': {name: tokenizer.model_id for name, tokenizer
+                           in models.MODEL_TOKENIZERS.items()},
+            'embedding_model': embedding_model.model_id,
+            'embedding_dimensions': int(dimensions),
+            'chunk_words': CHUNK_WORDS,
+            'chunk_overlap': CHUNK_OVERLAP,
+        }, f)
+    return {'lines': lines, 'contexts': len(ids)}
+
+
+class ContextStore:
+    """
+    Read-only view of a store written by build_store.
+    """
+
+    def __init__(self, store_dir: str) -> None:
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'index.json'), 'r',
+                  encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.rows = {cid: row for row, cid in enumerate(self.index['ids'])}
+        self.chunking = (self.index['chunk_words'],
+                         self.index['chunk_overlap'])
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _ragged(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        if name not in self._arrays:
+            values, offsets = (
+                np.load(os.path.join(self.store_dir, f'{name}{suffix}.npy'),
+                        mmap_mode='r')
+                for suffix in ('', '_offsets'))
+            self._arrays[name] = (values, offsets)
+        return self._arrays[name]
+
+    def _row(self, name: str, context: str) -> Optional[np.ndarray]:
+        row = self.rows.get(context_id(context))
+        if row is None:
+            return None
+        values, offsets = self._ragged(name)
+        return values[offsets[row]:offsets[row + 1]]
+
+    def token_ends(self, tokenizer_name: str,
+                   context: str) -> Optional[np.ndarray]:
+        """
+        Character offset where each token of context (no special tokens)
+        ends under one of models.MODEL_TOKENIZERS, as used by
+        truncation.TruncationEngine, or None if the context is not stored.
+        """
+        if tokenizer_name not in self.index['tokenizers']:
+            return None
+        return self._row(f'token_ends_{tokenizer_name}', context)
+
+    def chunk_embeddings(self, context: str) -> Optional[np.ndarray]:
+        """
+        Normalized MiniLM embeddings of the context's chunks, one row per
+        chunk, or None if the context is not stored.
+        """
+        flat = self._row('embeddings', context)
+        if flat is None:
+            return None
+        return flat.reshape(-1, self.index['embedding_dimensions'])
+
+
+_active: Optional[ContextStore] = None
+
+
+def check_store(store: ContextStore) -> None:
+    """
+    Raises ValueError unless store was built with the tokenizers and
+    embedding model the current models use.
+    """
+    import models
+    from Evaluation import embedding_model
+
+    index = store.index
+    tokenizers = {name: tokenizer.model_id for name, tokenizer
+                  in models.MODEL_TOKENIZERS.items()}
+    if index['tokenizers'] != tokenizers:
+        raise ValueError(f'{store.store_dir} was built with tokenizers '
+                         f'{index["tokenizers"]}, not {tokenizers}')
+    if index['embedding_model'] != embedding_model.model_id:
+        raise ValueError(f'{store.store_dir} was built with '
+                         f'{index["embedding_model"]}, not '
+                         f'{embedding_model.model_id}')
+    if index['ids']:
+        dimensions = embedding_model.embed(['']).shape[-1]
+        if index['embedding_dimensions'] != dimensions:
+            raise ValueError(f'{store.store_dir} holds '
+                             f'{index["embedding_dimensions"]}-dimensional '
+                             f'embeddings, not {dimensions}-dimensional')
+
+
+def use_store(store_dir: Optional[str]) -> Optional[ContextStore]:
+    """
+    Makes the store at store_dir the one consulted by models.py and
+    context_selection.py; None turns lookups off. Raises ValueError if the
+    store does not match the current models.
+    """
+    global _active
+    if not store_dir:
+        _active = None
+        return None
+    store = ContextStore(store_dir)
+    check_store(store)
+    _active = store
+    return _active
+
+
+def active_store() -> Optional[ContextStore]:
+    return _active
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('dataset', nargs='?', default='quac_simple_val.jsonl')
+    parser.add_argument('store_dir', nargs='?', default='quac_store')
+    args = parser.parse_args()
+    counts = build_store(args.dataset, args.store_dir)
+    print(f"Indexed {counts['contexts']} distinct contexts "
+          f"from {counts['lines']} lines into {args.store_dir}")
@@ -1,16 +1,15 @@
+import argparse
 import json
 
-def convert_quac_to_simple_format(quac_file, output_file, max_samples=None):
-    """
-    Converts QuAC dataset to a simple list of dicts with context, question, and answer.
-    """
-    with open(quac_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)['data']
+from dataset_io import NormalizedWriter, iter_quac_articles, open_text
 
-    simplified_data = []
-    count = 0
 
-    for article in data:
+def iter_quac_qas(quac_file):
+    """
+    Yields (context, question, answer) for every QA in a QuAC file, one
+    article at a time.
+    """
+    for article in iter_quac_articles(quac_file):
         for paragraph in article.get('paragraphs', []):
             context = paragraph.get('context', paragraph.get('text', ''))
             for qa in paragraph.get('qas', []):
@@ -26,25 +25,57 @@ def convert_quac_to_simple_format(quac_file, output_file, max_samples=None):
                     else:
                         answer = "impossible"
 
-                simplified_data.append({
-                    "context": context,
-                    "question": question,
-                    "answer": answer
-                })
+                yield context, question, answer
+
+
+def convert_quac_to_simple_format(quac_file, output_file, max_samples=None,
+                                  normalized=False, shard_size=None, compress=False):
+    """
+    Converts QuAC dataset to a simple list of dicts with context, question, and answer.
+
+    The input is streamed and rows are written as they are read. By default
+    output_file is one JSONL line per QA, gzipped if it ends in .gz or if
+    compress is set, in which case .gz is appended when missing. With
+    normalized=True, output_file is a directory holding a deduplicated
+    contexts table and question rows that reference it by context_id, split
+    into shards of shard_size questions and gzipped if compress is set.
+    """
+    count = 0
+    if normalized:
+        out = NormalizedWriter(output_file, shard_size, compress)
+        write = out.write
+    else:
+        if compress and not output_file.endswith('.gz'):
+            output_file += '.gz'
+        out = open_text(output_file, 'w')
+
+        def write(context, question, answer):
+            out.write(json.dumps({
+                "context": context,
+                "question": question,
+                "answer": answer
+            }) + "\n")
 
-                count += 1
-                if max_samples and count >= max_samples:
-                    break
+    with out:
+        for context, question, answer in iter_quac_qas(quac_file):
             if max_samples and count >= max_samples:
                 break
-        if max_samples and count >= max_samples:
-            break
-
-    with open(output_file, 'w', encoding='utf-8') as out_f:
-        for item in simplified_data:
-            out_f.write(json.dumps(item) + "\n")
+            write(context, question, answer)
+            count += 1
 
     print(f"Converted {count} QA pairs to simplified format and saved to {output_file}")
 
-# Example usage:
-convert_quac_to_simple_format('val_v0.2.json', 'quac_simple_val.jsonl', max_samples=100)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert QuAC to the simplified format.')
+    parser.add_argument('quac_file', nargs='?', default='val_v0.2.json')
+    parser.add_argument('output', nargs='?', default='quac_simple_val.jsonl')
+    parser.add_argument('--max-samples', type=int, default=100)
+    parser.add_argument('--normalized', action='store_true',
+                        help='write a context table plus question rows into the output directory')
+    parser.add_argument('--shard-size', type=int)
+    parser.add_argument('--gzip', action='store_true',
+                        help='gzip the output; flat output gets a .gz suffix')
+    args = parser.parse_args()
+    convert_quac_to_simple_format(args.quac_file, args.output, args.max_samples or None,
+                                  args.normalized, args.shard_size, args.gzip)
@@ -0,0 +1,240 @@
+"""
+Reading and writing the simplified QuAC datasets produced by convert.py.
+
+Two layouts are supported:
+
+flat        one JSONL file (optionally .gz) with a context, question and
+            answer on every line, as in quac_simple_val.jsonl.
+normalized  a directory with a manifest.json, a contexts table holding
+            every distinct context once under its context_id, and one or
+            more question shards whose rows reference a context_id.
+
+iter_records and iter_contexts accept either, so callers do not need to
+know which layout a dataset uses. Raw QuAC files are read one article at
+a time by iter_quac_articles.
+"""
+import gzip
+import hashlib
+import json
+import os
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+MANIFEST = 'manifest.json'
+NORMALIZED = 'normalized'
+
+
+def context_id(context: str) -> str:
+    return hashlib.sha1(context.encode('utf-8')).hexdigest()[:16]
+
+
+def open_text(path: str, mode: str = 'r') -> IO[str]:
+    """
+    Opens a text file for reading or writing, through gzip when the path
+    ends in .gz.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _iter_jsonl(path: str) -> Iterator[Optional[Dict[str, Any]]]:
+    # Yields None for blank lines so flat indices stay line numbers.
+    with open_text(path) as f:
+        for line in f:
+            yield json.loads(line) if line.strip() else None
+
+
+def iter_quac_articles(path: str,
+                       chunk_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the articles of a QuAC/SQuAD-style {"data": [...]} file one
+    at a time, reading chunk_size characters at a time instead of loading
+    the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open_text(path) as f:
+        buffer = ''
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            return not eof
+
+        while '"data"' not in buffer and fill():
+            pass
+        start = buffer.find('"data"')
+        if start < 0:
+            return
+        after_key = start + len('"data"')
+        while True:
+            position = buffer.find('[', after_key)
+            if position >= 0 or not fill():
+                break
+        if position < 0:
+            return
+        buffer = buffer[position + 1:]
+        while True:
+            stripped = buffer.lstrip().lstrip(',').lstrip()
+            if not stripped:
+                if not fill():
+                    return
+                continue
+            if stripped[0] == ']':
+                return
+            try:
+                article, end = decoder.raw_decode(stripped)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            buffer = stripped[end:]
+            yield article
+
+
+def is_normalized(path: str) -> bool:
+    return os.path.isdir(path) or os.path.basename(path) == MANIFEST
+
+
+def read_manifest(path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    The directory and manifest of a normalized dataset, given either the
+    directory or its manifest.json.
+    """
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    with open(os.path.join(directory, MANIFEST), 'r',
+              encoding='utf-8') as f:
+        return directory, json.load(f)
+
+
+def _load_contexts(directory: str,
+                   manifest: Dict[str, Any]) -> Dict[str, str]:
+    return {row['context_id']: row['context'] for row in
+            _iter_jsonl(os.path.join(directory, manifest['contexts']))
+            if row is not None}
+
+
+def _iter_lines(path: str) -> Iterator[Optional[str]]:
+    # Unparsed rows in index order. A blank flat line is None so it keeps
+    # its index; blank lines in question shards are not numbered.
+    if not is_normalized(path):
+        with open_text(path) as f:
+            for line in f:
+                yield line if line.strip() else None
+        return
+    directory, manifest = read_manifest(path)
+    for shard in manifest['questions']:
+        with open_text(os.path.join(directory, shard)) as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def iter_records(path: str,
+                 start: int = 0,
+                 stop: Optional[int] = None,
+                 shard: Optional[Tuple[int, int]] = None
+                 ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Lazily yields (index, {"context", "question", "answer"}) with index in
+    [start, stop) from either layout. The index is the line number in a
+    flat file and the question number in a normalized dataset, whose
+    contexts table is loaded once up front. shard=(k, n) keeps only the
+    indices that are k mod n. Only the kept lines are parsed.
+    """
+    contexts = None
+    if is_normalized(path):
+        contexts = _load_contexts(*read_manifest(path))
+    for index, line in enumerate(_iter_lines(path)):
+        if stop is not None and index >= stop:
+            return
+        if index < start or line is None:
+            continue
+        if shard is not None and index % shard[1] != shard[0]:
+            continue
+        row = json.loads(line)
+        if contexts is not None:
+            row = {'context': contexts[row['context_id']],
+                   'question': row['question'],
+                   'answer': row.get('answer', '')}
+        yield index, row
+
+
+def iter_contexts(path: str) -> Iterator[str]:
+    """
+    Yields the context of every flat row, or each distinct context of a
+    normalized dataset once.
+    """
+    if is_normalized(path):
+        directory, manifest = read_manifest(path)
+        yield from _load_contexts(directory, manifest).values()
+        return
+    for row in _iter_jsonl(path):
+        if row is not None:
+            yield row['context']
+
+
+class NormalizedWriter:
+    """
+    Writes a normalized dataset: contexts are deduplicated by context_id
+    into one table and questions go to shards of at most shard_size rows.
+    """
+
+    def __init__(self, directory: str, shard_size: Optional[int] = None,
+                 compress: bool = False) -> None:
+        self.directory = directory
+        self.shard_size = shard_size
+        self.suffix = '.jsonl.gz' if compress else '.jsonl'
+        os.makedirs(directory, exist_ok=True)
+        self.contexts_name = 'contexts' + self.suffix
+        self._contexts = open_text(os.path.join(directory,
+                                                self.contexts_name), 'w')
+        self._seen = set()
+        self.shards: List[str] = []
+        self._questions: Optional[IO[str]] = None
+        self._in_shard = 0
+        self.n_questions = 0
+
+    def _next_shard(self) -> None:
+        if self._questions is not None:
+            self._questions.close()
+        name = f'questions-{len(self.shards):05d}{self.suffix}'
+        self.shards.append(name)
+        self._questions = open_text(os.path.join(self.directory, name), 'w')
+        self._in_shard = 0
+
+    def write(self, context: str, question: str, answer: str) -> None:
+        cid = context_id(context)
+        if cid not in self._seen:
+            self._seen.add(cid)
+            self._contexts.write(json.dumps({'context_id': cid,
+                                             'context': context}) + '\n')
+        if self._questions is None or (self.shard_size
+                                       and self._in_shard >= self.shard_size):
+            self._next_shard()
+        self._questions.write(json.dumps({'context_id': cid,
+                                          'question': question,
+                                          'answer': answer}) + '\n')
+        self._in_shard += 1
+        self.n_questions += 1
+
+    def close(self) -> None:
+        if self._questions is None:
+            self._next_shard()
+        self._questions.close()
+        self._contexts.close()
+        with open(os.path.join(self.directory, MANIFEST), 'w',
+                  encoding='utf-8') as f:
+            json.dump({'layout': NORMALIZED,
+                       'contexts': self.contexts_name,
+                       'questions': self.shards,
+                       'n_contexts': len(self._seen),
+                       'n_questions': self.n_questions}, f, indent=2)
+
+    def __enter__(self) -> 'NormalizedWriter':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
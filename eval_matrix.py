@@ -0,0 +1,188 @@
+"""
+Evaluation-matrix engine for comparing the judge variants.
+
+A matrix has one row per (question, answer, context) sample and one
+column per judge. Base columns are the prompt variants in
+Evaluation.VARIANTS. Derived columns, such as average and the hybrid
+judge, are defined in DERIVED by the base variants each sample needs and
+a function of their scores. plan_cells resolves the requested columns
+into the set of (sample, variant) cells they depend on. Every cell is
+judged exactly once, in batched and optionally parallel judge_prompts
+calls. Derived columns and the MAE against target scores are then read
+off the stored cells without calling the judges again.
+
+    frame = evaluate_matrix(samples, targets=[1, -1])
+    write_matrix(frame, 'matrix.csv')   # or .parquet
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Callable, Dict, List, NamedTuple, Optional, Sequence,
+                    Tuple)
+
+import numpy as np
+import pandas as pd
+
+import Evaluation
+
+Sample = Tuple[str, str, str]
+Cell = Tuple[int, str]
+
+logger = logging.getLogger(__name__)
+
+
+class Derived(NamedTuple):
+    # Base variants a sample's score depends on, given its answer.
+    requires: Callable[[str], List[str]]
+    # Score from those variants' scores and the answer.
+    combine: Callable[[Dict[str, float], str], float]
+
+
+def _average(scores: Dict[str, float], answer: str) -> float:
+    values = [scores[v] for v in Evaluation.AVERAGE_VARIANTS]
+    return round(sum(values) / len(values), 3)
+
+
+def _hybrid(scores: Dict[str, float], answer: str) -> float:
+    return scores[Evaluation.hybrid_variant(answer)]
+
+
+DERIVED: Dict[str, Derived] = {
+    'average': Derived(lambda answer: list(Evaluation.AVERAGE_VARIANTS),
+                       _average),
+    'hybrid_shorter_or_cannotanswer': Derived(
+        lambda answer: [Evaluation.hybrid_variant(answer)], _hybrid),
+}
+
+COLUMNS = list(Evaluation.VARIANTS) + list(DERIVED)
+
+
+def _requirements(column: str, answer: str) -> List[str]:
+    if column in Evaluation.VARIANTS:
+        return [column]
+    if column in DERIVED:
+        return DERIVED[column].requires(answer)
+    raise ValueError(f'Unknown column: {column}')
+
+
+def plan_cells(samples: Sequence[Sample],
+               columns: Sequence[str] = COLUMNS) -> List[Cell]:
+    """
+    The distinct (sample index, base variant) cells needed by columns,
+    in a stable order.
+    """
+    cells: Dict[Cell, None] = {}
+    for index, (_, answer, _) in enumerate(samples):
+        for column in columns:
+            for variant in _requirements(column, answer):
+                cells[(index, variant)] = None
+    return list(cells)
+
+
+def compute_cells(samples: Sequence[Sample], cells: Sequence[Cell],
+                  batch_size: int = 8, workers: int = 1,
+                  chunk_size: int = 64,
+                  mode: Optional[str] = None,
+                  on_error: str = 'raise') -> Dict[Cell, float]:
+    """
+    Judges every cell once. Cells are split into chunks of chunk_size
+    prompts, run on up to workers threads. If a chunk fails, its error is
+    raised, or with on_error='nan' it is logged and the chunk's cells are
+    left as NaN.
+    """
+    if on_error not in ('raise', 'nan'):
+        raise ValueError(f'Unknown on_error: {on_error}')
+    headers = {}
+    prompts = []
+    limits = []
+    for index, variant in cells:
+        question, answer, context = samples[index]
+        if index not in headers:
+            headers[index] = Evaluation.prompt_header(question, answer,
+                                                      context)
+        prompts.append(Evaluation.build_prompt(variant, question, answer,
+                                               context,
+                                               header=headers[index]))
+        limits.append(Evaluation.VARIANTS[variant][1])
+
+    def run(start: int) -> List[float]:
+        end = start + chunk_size
+        try:
+            return Evaluation.judge_prompts(prompts[start:end],
+                                            limits[start:end],
+                                            batch_size=batch_size, mode=mode)
+        except Exception:
+            if on_error == 'raise':
+                raise
+            logger.exception('Judging cells %d-%d failed', start,
+                             min(end, len(prompts)) - 1)
+            return [float('nan')] * len(prompts[start:end])
+
+    starts = range(0, len(prompts), chunk_size)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(run, starts))
+    else:
+        chunks = [run(start) for start in starts]
+    scores = [score for chunk in chunks for score in chunk]
+    return dict(zip(cells, scores))
+
+
+def _column_score(column: str, index: int, answer: str,
+                  cells: Dict[Cell, float]) -> float:
+    if column in Evaluation.VARIANTS:
+        return cells[(index, column)]
+    derived = DERIVED[column]
+    scores = {v: cells[(index, v)] for v in derived.requires(answer)}
+    if any(np.isnan(score) for score in scores.values()):
+        return float('nan')
+    return derived.combine(scores, answer)
+
+
+def evaluate_matrix(samples: Sequence[Sample],
+                    columns: Sequence[str] = COLUMNS,
+                    targets: Optional[Sequence[float]] = None,
+                    batch_size: int = 8, workers: int = 1,
+                    mode: Optional[str] = None,
+                    on_error: str = 'raise') -> pd.DataFrame:
+    """
+    One row per sample with its question, answer, optional target and a
+    score for every column. on_error is passed to compute_cells; with
+    'nan', failed cells are NaN.
+    """
+    cells = compute_cells(samples, plan_cells(samples, columns),
+                          batch_size=batch_size, workers=workers, mode=mode,
+                          on_error=on_error)
+    rows = []
+    for index, (question, answer, _) in enumerate(samples):
+        row = {'question': question, 'answer': answer}
+        if targets is not None:
+            row['target'] = targets[index]
+        for column in columns:
+            row[column] = _column_score(column, index, answer, cells)
+        rows.append(row)
+    return pd.DataFrame(rows, columns=['question', 'answer']
+                        + (['target'] if targets is not None else [])
+                        + list(columns))
+
+
+def mean_absolute_errors(frame: pd.DataFrame,
+                         columns: Optional[Sequence[str]] = None
+                         ) -> pd.Series:
+    """
+    MAE of each score column against the target column, skipping NaN.
+    """
+    if columns is None:
+        columns = [c for c in frame.columns
+                   if c not in ('question', 'answer', 'target')]
+    return (frame[list(columns)].sub(frame['target'], axis=0)
+            .abs().mean(skipna=True))
+
+
+def write_matrix(frame: pd.DataFrame, path: str) -> None:
+    """
+    Writes frame as Parquet if path ends in .parquet, otherwise as CSV.
+    """
+    if path.endswith('.parquet'):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
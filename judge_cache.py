@@ -0,0 +1,134 @@
+"""
+Content-addressed cache for judge scores.
+
+Scores are keyed on a hash of everything that determines them: the judge
+model IDs, the generation settings and the full prompt (which holds the
+variant instruction and the truncated question, answer and context).
+Lookups go through an in-memory LRU tier first and then an optional
+SQLite tier that survives restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+def make_key(*parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class JudgeCache:
+    """
+    Two-tier score cache: an LRU dict of max_entries in front of an
+    SQLite table at path. Pass path=None for a memory-only cache.
+    """
+
+    def __init__(self, path: Optional[str] = None,
+                 max_entries: int = 100_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = True
+        self._memory: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        # A connection must not be shared with a forked worker process.
+        if self._db is None or self._db_pid != os.getpid():
+            self._db_pid = os.getpid()
+            self._db = sqlite3.connect(self.path, timeout=30,
+                                       check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS scores '
+                             '(key TEXT PRIMARY KEY, score REAL NOT NULL)')
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, score: float) -> None:
+        self._memory[key] = score
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[float]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+            db = self._connection()
+            if db is not None:
+                row = db.execute('SELECT score FROM scores WHERE key = ?',
+                                 (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put_many(self, items: Iterable[Tuple[str, float]]) -> None:
+        if not self.enabled:
+            return
+        items = list(items)
+        with self._lock:
+            for key, score in items:
+                self._remember(key, score)
+            db = self._connection()
+            if db is not None:
+                db.executemany('INSERT OR REPLACE INTO scores VALUES (?, ?)',
+                               items)
+                db.commit()
+
+    def put(self, key: str, score: float) -> None:
+        self.put_many([(key, score)])
+
+    def clear(self, disk: bool = False) -> None:
+        with self._lock:
+            self._memory.clear()
+            if disk:
+                db = self._connection()
+                if db is not None:
+                    db.execute('DELETE FROM scores')
+                    db.commit()
+
+    def use_memory_only(self) -> None:
+        """
+        Detaches the SQLite tier and drops the scores held in memory, so
+        nothing computed from now on reaches or comes from disk.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+            self.path = None
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+        }
+
+
+# Shared cache used by Evaluation.py. Set JUDGE_CACHE_PATH to an empty
+# string to keep it in memory only.
+score_cache = JudgeCache(os.environ.get('JUDGE_CACHE_PATH',
+                                        'judge_cache.sqlite3') or None)
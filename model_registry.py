@@ -0,0 +1,352 @@
+"""
+Lazy, shared registry for the Hugging Face models used by models.py
+and Evaluation.py.
+
+Models are declared at import time as LazyModel handles, which cost
+nothing until they are first used. Pipelines and sentence models load as
+the backends.py implementations of their task, so handles expose
+answer(), generate() and embed(). Each (kind, model ID, task) is
+loaded once per process and shared by every handle that refers to it,
+so models.flan and Evaluation.faithfulness_model_1 use the same weights.
+
+Pipelines run on one of BACKENDS, chosen with MODEL_BACKEND or
+set_backend(): 'fp32' is the stock PyTorch model, 'int8' applies dynamic
+int8 quantization to its Linear layers. Quantized state dicts are saved
+under QUANTIZED_DIR, keyed by the torch and transformers versions. Later
+processes build the architecture from its config, quantize that empty
+skeleton and load the saved weights into it, so the fp32 checkpoint is
+only read the first time.
+
+With a memory budget (MODEL_MEMORY_BUDGET_MB or set_memory_budget()),
+loaded models are kept in least-recently-used order and the oldest are
+evicted whenever a load pushes the resident weights over the budget.
+Evicted models reload on their next call, so a small node runs slower
+instead of running out of memory. residency() and events report what is
+resident and every load and eviction.
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+PIPELINE = 'pipeline'
+TOKENIZER = 'tokenizer'
+SENTENCE_TRANSFORMER = 'sentence-transformer'
+
+Key = Tuple[str, str, Optional[str]]
+
+FP32 = 'fp32'
+INT8 = 'int8'
+BACKENDS = (FP32, INT8)
+QUANTIZED_DIR = os.environ.get('QUANTIZED_MODEL_DIR', 'quantized_models')
+
+_instances: 'OrderedDict[Key, Any]' = OrderedDict()
+_sizes: Dict[Key, float] = {}
+_declared: Dict[Key, 'LazyModel'] = {}
+_lock = threading.RLock()
+_backend = os.environ.get('MODEL_BACKEND', FP32)
+_budget_mb: Optional[float] = (
+    float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0)) or None)
+
+# Most recent load/evict events, oldest first.
+events: Deque[Dict[str, Any]] = deque(maxlen=1000)
+
+
+def quantized_path(model_id: str) -> str:
+    import torch
+    import transformers
+    # Packed weights are only readable by the versions that wrote them.
+    versions = (f'torch{torch.__version__}'
+                f'-transformers{transformers.__version__}')
+    return os.path.join(QUANTIZED_DIR, versions.replace('+', '_'),
+                        model_id.replace('/', '--') + f'-{INT8}.pt')
+
+
+# Model class a pipeline task loads, for building a skeleton from config.
+_AUTO_MODELS = {'question-answering': 'AutoModelForQuestionAnswering',
+                'text2text-generation': 'AutoModelForSeq2SeqLM'}
+
+
+def _quantize(model: Any) -> Any:
+    import torch
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_pipeline(task: str, model_id: str) -> Any:
+    import torch
+    import transformers
+    path = quantized_path(model_id)
+    if not os.path.exists(path):
+        pipe = transformers.pipeline(task, model=model_id)
+        model = _quantize(pipe.model)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        torch.save(model.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+        model.eval()
+        pipe.model = model
+        return pipe
+    auto_model = getattr(transformers, _AUTO_MODELS[task])
+    model = auto_model.from_config(
+        transformers.AutoConfig.from_pretrained(model_id))
+    if model.can_generate():
+        try:
+            model.generation_config = (
+                transformers.GenerationConfig.from_pretrained(model_id))
+        except OSError:
+            pass
+    model = _quantize(model)
+    model.load_state_dict(torch.load(path, weights_only=True))
+    model.eval()
+    return transformers.pipeline(
+        task, model=model,
+        tokenizer=transformers.AutoTokenizer.from_pretrained(model_id))
+
+
+def _load(kind: str, model_id: str, task: Optional[str]) -> Any:
+    import backends
+    if kind == PIPELINE:
+        if _backend == INT8:
+            pipe = _quantized_pipeline(task, model_id)
+        else:
+            from transformers import pipeline as hf_pipeline
+            pipe = hf_pipeline(task, model=model_id)
+        return backends.wrap_pipeline(task, pipe, model_id)
+    if kind == TOKENIZER:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_id)
+    if kind == SENTENCE_TRANSFORMER:
+        from sentence_transformers import SentenceTransformer
+        return backends.SentenceTransformerEmbedder(
+            SentenceTransformer(model_id), model_id)
+    raise ValueError(f'Unknown model kind: {kind}')
+
+
+def _tensor_bytes(value: Any, seen: set) -> int:
+    # Dynamically quantized Linear layers store their weights as a packed
+    # (weight, bias) tuple in the state dict rather than as parameters.
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v, seen) for v in value)
+    if not hasattr(value, 'element_size'):
+        return 0
+    # Tied weights appear under several keys; count their storage once.
+    pointer = value.data_ptr() if hasattr(value, 'data_ptr') else id(value)
+    if pointer in seen:
+        return 0
+    seen.add(pointer)
+    return value.numel() * value.element_size()
+
+
+def footprint_mb(instance: Any) -> float:
+    """
+    Size of a model's state_dict tensors in MB, which unlike parameters()
+    includes the packed weights of quantized layers; 0 for objects
+    without torch weights, such as tokenizers and stand-ins.
+    """
+    module = getattr(instance, 'model', instance)
+    if not hasattr(module, 'state_dict'):
+        return 0.0
+    seen: set = set()
+    try:
+        total = sum(_tensor_bytes(value, seen)
+                    for value in module.state_dict().values())
+    except Exception:
+        return 0.0
+    return total / 2 ** 20
+
+
+def _record(event: str, key: Key, size_mb: float) -> None:
+    events.append({'event': event, 'kind': key[0], 'model_id': key[1],
+                   'task': key[2], 'mb': size_mb,
+                   'resident_mb': resident_mb(), 'time': time.time()})
+
+
+def _drop(key: Key) -> None:
+    del _instances[key]
+    _sizes.pop(key, None)
+
+
+def _evict_over_budget(keep: Key) -> None:
+    if _budget_mb is None:
+        return
+    for key in list(_instances):
+        if resident_mb() <= _budget_mb:
+            break
+        size = _sizes.get(key, 0.0)
+        if key == keep or size == 0:
+            continue
+        _drop(key)
+        _record('evict', key, size)
+    gc.collect()
+
+
+def _store(key: Key, instance: Any, event: str,
+           size_mb: Optional[float] = None) -> None:
+    _instances[key] = instance
+    _sizes[key] = footprint_mb(instance) if size_mb is None else size_mb
+    _record(event, key, _sizes[key])
+    _evict_over_budget(keep=key)
+
+
+def resident_mb() -> float:
+    return sum(_sizes.values())
+
+
+def memory_budget() -> Optional[float]:
+    return _budget_mb
+
+
+def set_memory_budget(budget_mb: Optional[float]) -> None:
+    """
+    Caps the resident model weights at budget_mb, evicting the least
+    recently used models right away if needed; None removes the cap.
+    """
+    global _budget_mb
+    with _lock:
+        _budget_mb = budget_mb
+        _evict_over_budget(keep=None)
+
+
+def residency() -> Dict[str, Any]:
+    """
+    Resident models from least to most recently used, with their sizes,
+    the total and the budget.
+    """
+    with _lock:
+        models = [{'kind': key[0], 'model_id': key[1], 'task': key[2],
+                   'mb': _sizes.get(key, 0.0)} for key in _instances]
+    return {'models': models, 'resident_mb': resident_mb(),
+            'budget_mb': _budget_mb}
+
+
+def backend() -> str:
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """
+    Switches pipelines to backend name. Pipelines loaded on the previous
+    backend are dropped and reload on next use; tokenizers and sentence
+    models are kept.
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown backend: {name}')
+    with _lock:
+        if name != _backend:
+            for key in [key for key in _instances if key[0] == PIPELINE]:
+                _drop(key)
+        _backend = name
+
+
+def get(kind: str, model_id: str, task: Optional[str] = None) -> Any:
+    """
+    Returns the shared instance for a model, loading it on first use.
+    """
+    key = (kind, model_id, task)
+    with _lock:
+        instance = _instances.get(key)
+        if instance is not None:
+            _instances.move_to_end(key)
+            return instance
+        instance = _load(kind, model_id, task)
+        _store(key, instance, 'load')
+    return instance
+
+
+class LazyModel:
+    """
+    Callable handle that forwards to the shared instance of a model,
+    loading it the first time it is used.
+    """
+
+    def __init__(self, kind: str, model_id: str,
+                 task: Optional[str] = None) -> None:
+        self.kind = kind
+        self.model_id = model_id
+        self.task = task
+
+    @property
+    def key(self) -> Key:
+        return (self.kind, self.model_id, self.task)
+
+    @property
+    def loaded(self) -> bool:
+        return self.key in _instances
+
+    def load(self) -> Any:
+        return get(self.kind, self.model_id, self.task)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'LazyModel({self.kind}, {self.model_id!r}, {state})'
+
+
+def _declare(kind: str, model_id: str,
+             task: Optional[str] = None) -> LazyModel:
+    key = (kind, model_id, task)
+    with _lock:
+        if key not in _declared:
+            _declared[key] = LazyModel(kind, model_id, task)
+        return _declared[key]
+
+
+def pipeline(task: str, model_id: str) -> LazyModel:
+    return _declare(PIPELINE, model_id, task)
+
+
+def tokenizer(model_id: str) -> LazyModel:
+    return _declare(TOKENIZER, model_id)
+
+
+def sentence_model(model_id: str) -> LazyModel:
+    return _declare(SENTENCE_TRANSFORMER, model_id)
+
+
+def install(model: LazyModel, instance: Any) -> None:
+    """
+    Makes instance the shared object behind a handle, e.g. a stand-in
+    model for tests and benchmarks.
+    """
+    with _lock:
+        _store(model.key, instance, 'install')
+
+
+def unload_all() -> None:
+    with _lock:
+        _instances.clear()
+        _sizes.clear()
+
+
+def warm_up(models: Optional[List[LazyModel]] = None) -> None:
+    """
+    Loads the given models, or every declared model, ahead of the
+    first request, in order. Warm-up never evicts: under a memory budget
+    it stops at the first model that does not fit next to the ones
+    already resident, and that model and the rest load on demand.
+    """
+    for model in (models if models is not None else list(_declared.values())):
+        with _lock:
+            if model.key in _instances:
+                continue
+            instance = _load(*model.key)
+            size = footprint_mb(instance)
+            if (_budget_mb is not None and _instances
+                    and resident_mb() + size > _budget_mb):
+                return
+            _store(model.key, instance, 'load', size)
+
+
+def loaded_models() -> List[Key]:
+    return list(_instances)
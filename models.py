@@ -1,19 +1,44 @@
-from transformers import pipeline, AutoTokenizer
-from Evaluation import Evaluate
-from typing import Dict, List, Any, Tuple
-# import jsnon
+from Evaluation import Evaluate, Evaluate_batch, Evaluate_candidates
+from typing import (Any, Callable, Dict, Iterable, Iterator, List,
+                    NamedTuple, Optional, Tuple)
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import contextvars
+import os
+import threading
+import numpy as np
+import model_registry
+import tracing
+from truncation import TruncationEngine
+from dataset_io import iter_records
 
-qa_pipeline = pipeline(
+qa_pipeline = model_registry.pipeline(
     'question-answering',
-    model='deepset/roberta-base-squad2'
+    'deepset/roberta-base-squad2'
     )
-flan = pipeline('text2text-generation', model='google/flan-t5-base')
-bert_pipeline = pipeline(
+flan = model_registry.pipeline('text2text-generation', 'google/flan-t5-base')
+bert_pipeline = model_registry.pipeline(
     'question-answering',
-    model='bert-large-uncased-whole-word-masking-finetuned-squad'
+    'bert-large-uncased-whole-word-masking-finetuned-squad'
 )
 
-tokenizer = AutoTokenizer.from_pretrained('google/flan-t5-base')
+tokenizer = model_registry.tokenizer('google/flan-t5-base')
+
+# Tokenizer of each candidate model, as indexed by context_store.py.
+MODEL_TOKENIZERS = {
+    'flan': tokenizer,
+    'roberta': model_registry.tokenizer(qa_pipeline.model_id),
+    'bert': model_registry.tokenizer(bert_pipeline.model_id),
+}
+
+# Input length, in tokens, of each candidate model.
+MODEL_MAX_LENGTHS = {
+    'flan': 512,
+    'roberta': 512,
+    'bert': 512,
+}
+
+truncator = TruncationEngine(MODEL_TOKENIZERS, MODEL_MAX_LENGTHS)
 
 dataset = 'quac_simple_val.jsonl'
 samples: List[Dict[str, Any]] = []
@@ -34,65 +59,417 @@ def truncate_context(context: str,
     """
     Truncates the context to fit within
     the maximum length allowed by the model.
+    Sized for FLAN-T5, whose context is also the one the judges see.
+    """
+    return truncator.truncate('flan', context, question, max_length)
+
+
+def build_flan_prompt(context: str, question: str) -> str:
     """
-    tokens = tokenizer.encode(question,
-                              context,
-                              truncation=True,
-                              max_length=max_length)
-    decoded = tokenizer.decode(tokens, skip_special_tokens=True)
-    if decoded.startswith(question):
-        return decoded[len(question):].strip()
-    return decoded
+    Builds the FLAN-T5 prompt used to generate a free-text answer.
+    """
+    return (
+        f'''Based on the context: {context};
+            generate an answer to the question: {question}'''
+    )
+
+
+def prepare_contexts(context: str,
+                     question: str,
+                     top_k: Optional[int] = None) -> Dict[str, str]:
+    """
+    Context passed to each candidate model, keyed by model name: the top_k
+    chunks most similar to the question when top_k is set, then truncated
+    to that model's own input length. The judges use the 'flan' entry.
+    """
+    if top_k is not None:
+        from context_selection import select_context
+        with tracing.span('select_context'):
+            context = select_context(context, question, top_k=top_k)
+    return truncator.truncate_all(context, question)
+
+
+def roberta_answer(question: str, context: str) -> str:
+    return qa_pipeline.answer([question], [context])[0][0]
+
+
+def flan_answer(question: str, context: str) -> str:
+    return _flan_batch([question], [context], 1)[0]
+
+
+def bert_answer(question: str, context: str) -> str:
+    return bert_pipeline.answer([question], [context])[0][0]
+
+
+# Candidate generators in the order answer_question prefers them on ties.
+CANDIDATES = [
+    ('roberta', roberta_answer),
+    ('flan', flan_answer),
+    ('bert', bert_answer),
+]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+# Concurrent requests currently running candidates with reduced torch
+# threads, and the thread count to restore when the last one finishes.
+_split_requests = 0
+_saved_threads: Optional[int] = None
 
 
-def answer_question(context: str, question: str) -> Tuple[str, float]:
+def _candidate_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Returns the shared thread pool for concurrent candidates.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='candidate')
+            _executor_workers = max_workers
+        return _executor
+
+
+@contextlib.contextmanager
+def _split_intra_op_threads(threads: int) -> Iterator[None]:
+    """
+    Lowers torch's process-wide intra-op thread count to threads while the
+    candidate workers run, so they do not oversubscribe the CPU, and
+    restores it once no concurrent request needs the split any more.
+    """
+    global _split_requests, _saved_threads
+    try:
+        import torch
+    except ImportError:
+        # Stand-in models do not need torch.
+        yield
+        return
+    with _executor_lock:
+        if _split_requests == 0:
+            _saved_threads = torch.get_num_threads()
+        _split_requests += 1
+        torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        with _executor_lock:
+            _split_requests -= 1
+            if _split_requests == 0 and _saved_threads is not None:
+                torch.set_num_threads(_saved_threads)
+
+
+def _traced_candidate(name: str,
+                      generate: Any,
+                      question: str,
+                      context: str) -> str:
+    with tracing.span(f'candidate:{name}') as stage:
+        answer = generate(question, context)
+        if stage is not None:
+            stage.tokens = tracing.count_tokens(tokenizer, [answer])
+    return answer
+
+
+def answer_question(context: str,
+                    question: str,
+                    concurrent: bool = False,
+                    max_workers: int = 3,
+                    intra_op_threads: Optional[int] = None,
+                    trace: Optional[tracing.Trace] = None,
+                    top_k: Optional[int] = None
+                    ) -> Tuple[str, float]:
     """
     Function that takes a context and a question, and returns the best answer
     taken from 3 different models: RoBERTa, BERT, and FLAN-T5.
     Args:
         context (str): The context in which the question is asked.
         question (str): The question to be answered.
+        concurrent (bool): Run the candidate models in a thread pool
+            instead of one after another.
+        max_workers (int): How many candidates may run at once.
+        intra_op_threads (Optional[int]): torch threads used by each
+            worker while the candidates run; defaults to the CPU count
+            divided by max_workers. The judge pass afterwards gets the
+            full thread count back.
+        trace (Optional[tracing.Trace]): Filled with per-stage timings,
+            token counts and every candidate's score when given.
+        top_k (Optional[int]): Keep only the top_k context chunks most
+            similar to the question instead of the head of the context.
     Returns:
         Tuple[str, float]: The best answer and its faithfulness score.
     """
-    truncated_context = truncate_context(context, question)
-    try:
-        prediction = qa_pipeline(question=question, context=truncated_context)
-        predicted_answer = prediction['answer']
-    except Exception:
-        predicted_answer = 'CANNOTANSWER'
-    best_answer = predicted_answer
-    best_score = Evaluate(question, predicted_answer, truncated_context)
-    try:
-        flan_prompt = (
-            f'''Based on the context: {truncated_context};
-            generate an answer to the question: {question}'''
-        )
-        predicted_answer_flan = flan(flan_prompt,
-                                     max_new_tokens=128)[0]['generated_text']
-    except Exception:
-        predicted_answer_flan = 'CANNOTANSWER'
-    score_flan = Evaluate(question, predicted_answer_flan, truncated_context)
-    if score_flan > best_score:
-        best_answer = predicted_answer_flan
-        best_score = score_flan
+    with tracing.request(trace):
+        contexts = prepare_contexts(context, question, top_k)
+        if concurrent:
+            executor = _candidate_executor(max_workers)
+            if intra_op_threads is None:
+                intra_op_threads = max(1, (os.cpu_count() or 1) // max_workers)
+            with _split_intra_op_threads(intra_op_threads):
+                # Copy the context so spans in the workers reach the trace.
+                futures = [executor.submit(contextvars.copy_context().run,
+                                           _traced_candidate, name, generate,
+                                           question, contexts[name])
+                           for name, generate in CANDIDATES]
+                answers = [future.result() for future in futures]
+        else:
+            answers = [_traced_candidate(name, generate,
+                                         question, contexts[name])
+                       for name, generate in CANDIDATES]
+
+        scores = Evaluate_candidates(question, answers, contexts['flan'])
+        if trace is not None:
+            for (name, _), answer, score in zip(CANDIDATES, answers, scores):
+                trace.candidates[name] = {'answer': answer, 'score': score}
+        # argmax keeps the first maximum, so ties still go to the earlier model.
+        best = int(np.argmax(scores))
+        return answers[best], scores[best]
+
+
+def _flan_batch(questions: List[str],
+                contexts: List[str],
+                batch_size: int) -> List[str]:
+    """
+    Generates FLAN-T5 answers for a batch of prompts, falling back to one
+    call per prompt so a single failure only affects its own answer.
+    """
+    prompts = [build_flan_prompt(c, q) for q, c in zip(questions, contexts)]
     try:
-        bert_score = bert_pipeline(question=question,
-                                   context=truncated_context)
-        predicted_answer_bert = bert_score['answer']
+        return flan.generate(prompts, 128, batch_size)
     except Exception:
-        predicted_answer_bert = 'CANNOTANSWER'
-    score_bert = Evaluate(question, predicted_answer_bert, truncated_context)
-    if score_bert > best_score:
-        best_answer = predicted_answer_bert
-        best_score = score_bert
-    return best_answer, best_score
+        answers = []
+        for prompt in prompts:
+            try:
+                answers.append(flan.generate([prompt], 128, 1)[0])
+            except Exception:
+                answers.append('CANNOTANSWER')
+        return answers
+
+
+def _qa_answers(backend: Any,
+                questions: List[str],
+                contexts: List[str],
+                batch_size: int) -> List[str]:
+    return [answer for answer, _ in
+            backend.answer(questions, contexts, batch_size)]
+
+
+def score_candidates(pairs: List[Tuple[str, str]],
+                     batch_size: int = 8,
+                     top_k: Optional[int] = None
+                     ) -> List[Dict[str, Tuple[str, float]]]:
+    """
+    Runs every candidate model over the pairs in padded batches and judges
+    all of their answers together.
+    Args:
+        pairs (List[Tuple[str, str]]): (context, question) pairs.
+        batch_size (int): Number of inputs per forward pass.
+        top_k (Optional[int]): Context chunks to keep, see prepare_contexts.
+    Returns:
+        List[Dict[str, Tuple[str, float]]]: For each pair, in input order,
+        the (answer, faithfulness score) of each model in CANDIDATES.
+    """
+    if not pairs:
+        return []
+    questions = [question for _, question in pairs]
+    prepared = [prepare_contexts(context, question, top_k)
+                for context, question in pairs]
+    contexts = {name: [p[name] for p in prepared] for name in MODEL_TOKENIZERS}
+
+    with tracing.span('candidate:roberta'):
+        roberta = _qa_answers(qa_pipeline, questions, contexts['roberta'],
+                              batch_size)
+    with tracing.span('candidate:flan'):
+        flan_answers = _flan_batch(questions, contexts['flan'], batch_size)
+    with tracing.span('candidate:bert'):
+        bert = _qa_answers(bert_pipeline, questions, contexts['bert'],
+                           batch_size)
+    candidates = [roberta, flan_answers, bert]
+    n = len(pairs)
+    scores = Evaluate_batch(questions * len(candidates),
+                            [a for answers in candidates for a in answers],
+                            contexts['flan'] * len(candidates),
+                            batch_size=batch_size)
+    return [
+        {name: (candidates[k][i], scores[k * n + i])
+         for k, (name, _) in enumerate(CANDIDATES)}
+        for i in range(n)
+    ]
+
+
+def answer_questions(pairs: List[Tuple[str, str]],
+                     batch_size: int = 8,
+                     top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """
+    Batched version of answer_question. Every candidate model and the
+    judge run over the whole input in padded batches of batch_size.
+    Args:
+        pairs (List[Tuple[str, str]]): (context, question) pairs.
+        batch_size (int): Number of inputs per forward pass.
+        top_k (Optional[int]): Context chunks to keep, see prepare_contexts.
+    Returns:
+        List[Tuple[str, float]]: The best answer and its faithfulness
+        score for each pair, in input order.
+    """
+    results = []
+    for scored in score_candidates(pairs, batch_size, top_k):
+        judged = list(scored.values())
+        # argmax keeps the first maximum, so ties go to the earlier model.
+        best = int(np.argmax([score for _, score in judged]))
+        results.append(judged[best])
+    return results
+
+
+class CascadeResult(NamedTuple):
+    answer: str
+    score: float
+    stage: str
+    judge_calls: int
+
+
+def predict_candidate(name: str,
+                      question: str,
+                      context: str) -> Tuple[str, Optional[float]]:
+    """
+    Returns a candidate's answer and its model confidence. Only the
+    extractive QA pipelines report a confidence; FLAN returns None.
+    """
+    if name == 'roberta':
+        return qa_pipeline.answer([question], [context])[0]
+    if name == 'bert':
+        return bert_pipeline.answer([question], [context])[0]
+    return dict(CANDIDATES)[name](question, context), None
+
+
+def answer_question_cascade(context: str,
+                            question: str,
+                            threshold: float = 0.9,
+                            order: Tuple[str, ...] = ('roberta',
+                                                      'flan',
+                                                      'bert'),
+                            min_confidence: float = 0.1,
+                            top_k: Optional[int] = None) -> CascadeResult:
+    """
+    Early-exit version of answer_question. Candidates run in the given
+    order and the cascade stops at the first one whose faithfulness score
+    reaches the threshold.
+    Args:
+        context (str): The context in which the question is asked.
+        question (str): The question to be answered.
+        threshold (float): Judge score at which a candidate is accepted.
+        order (Tuple[str, ...]): Candidate names from CANDIDATES, in the
+            order they are tried.
+        min_confidence (float): QA candidates whose pipeline score is below
+            this are not sent to the judge.
+        top_k (Optional[int]): Context chunks to keep, see prepare_contexts.
+    Returns:
+        CascadeResult: The chosen answer, its score, the stage that
+        produced it and how many judge calls were made. If no candidate
+        clears the threshold, the best judged one is returned.
+    """
+    contexts = prepare_contexts(context, question, top_k)
+    candidates = ((name,) + predict_candidate(name, question, contexts[name])
+                  for name in order)
+    return _run_cascade(
+        candidates, threshold, min_confidence,
+        lambda name, answer: Evaluate(question, answer, contexts['flan']))
+
+
+Candidate = Tuple[str, str, Optional[float]]
+
+
+def _run_cascade(candidates: Iterable[Candidate],
+                 threshold: float,
+                 min_confidence: float,
+                 judge: Callable[[str, str], float]) -> CascadeResult:
+    # candidates yields (name, answer, confidence) in cascade order and is
+    # only advanced until a candidate is accepted.
+    best: Optional[CascadeResult] = None
+    skipped: List[Candidate] = []
+    judge_calls = 0
+    for name, answer, confidence in candidates:
+        if confidence is not None and confidence < min_confidence:
+            skipped.append((name, answer, confidence))
+            continue
+        score = judge(name, answer)
+        judge_calls += 1
+        if best is None or score > best.score:
+            best = CascadeResult(answer, score, name, judge_calls)
+        if score >= threshold:
+            return best._replace(judge_calls=judge_calls)
+
+    if best is None:
+        # Every candidate failed the pre-check: judge the most confident.
+        name, answer, _ = max(skipped, key=lambda s: s[2])
+        return CascadeResult(answer, judge(name, answer), name,
+                             judge_calls + 1)
+    return best._replace(judge_calls=judge_calls)
+
+
+def evaluate_cascade_thresholds(thresholds: List[float],
+                                path: str = dataset,
+                                n_samples: int = 30,
+                                order: Tuple[str, ...] = ('roberta',
+                                                          'flan',
+                                                          'bert'),
+                                min_confidence: float = 0.1,
+                                top_k: Optional[int] = None
+                                ) -> List[Dict[str, Any]]:
+    """
+    Runs the cascade over the first n_samples of a dataset for each
+    threshold and reports the mean score, the mean number of judge calls
+    the cascade makes and how often each stage answered. Every candidate
+    is generated and judged at most once per sample; each threshold is
+    then replayed on the stored answers and scores.
+    """
+    samples = []
+    for _, entry in iter_records(path, stop=n_samples):
+        question = entry['question']
+        contexts = prepare_contexts(entry['context'], question, top_k)
+        candidates = [(name,) + predict_candidate(name, question,
+                                                  contexts[name])
+                      for name in order]
+        samples.append((question, contexts['flan'], candidates, {}))
+
+    def stored_judge(question: str, context: str,
+                     scores: Dict[str, float]) -> Callable[[str, str], float]:
+        def judge(name: str, answer: str) -> float:
+            if name not in scores:
+                scores[name] = Evaluate(question, answer, context)
+            return scores[name]
+        return judge
+
+    report = []
+    for threshold in thresholds:
+        results = [_run_cascade(candidates, threshold, min_confidence,
+                                stored_judge(question, context, scores))
+                   for question, context, candidates, scores in samples]
+        stages: Dict[str, int] = {}
+        for r in results:
+            stages[r.stage] = stages.get(r.stage, 0) + 1
+        count = len(results) or 1
+        report.append({
+            'threshold': threshold,
+            'samples': len(results),
+            'mean_score': sum(r.score for r in results) / count,
+            'mean_judge_calls': sum(r.judge_calls for r in results) / count,
+            'stages': stages,
+        })
+    return report
+
+
+def warm_up() -> None:
+    """
+    Loads the candidate models and the judges before the first request.
+    """
+    model_registry.warm_up()
 
 
-context = input("Enter context: ")
-question = input("Enter question: ")
+if __name__ == '__main__':
+    context = input("Enter context: ")
+    question = input("Enter question: ")
 
-print('Best answer: ', answer_question(context, question))
+    print('Best answer: ', answer_question(context, question))
 # with open(dataset, 'r') as f:
 #     for line in f:
 #         entry = json.loads(line.strip())
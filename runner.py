@@ -0,0 +1,312 @@
+"""
+Streaming, resumable evaluation of the answer ensemble over a JSONL
+dataset such as quac_simple_val.jsonl, or a normalized dataset directory
+(see convert.py).
+
+Samples are read lazily and processed in batches. Each result is
+appended to the output JSONL as soon as its batch is done, and a small
+checkpoint file records how far the run got, so an interrupted run
+picks up where it stopped. The checkpoint also records the dataset and
+the settings that decide which samples are scored and how, and a run with
+different ones refuses to resume from it.
+"""
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import context_store
+from dataset_io import iter_records
+from models import CANDIDATES, score_candidates
+
+
+def iter_samples(path: str,
+                 start: int = 0,
+                 stop: Optional[int] = None,
+                 shard: Optional[Tuple[int, int]] = None
+                 ) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yields samples from a flat or normalized dataset with index in
+    [start, stop). shard=(k, n) keeps only the samples whose index is
+    k mod n.
+    """
+    for index, entry in iter_records(path, start, stop, shard):
+        yield {
+            'index': index,
+            'context': entry['context'],
+            'question': entry['question'],
+            'gold_answer': entry.get('answer', ''),
+        }
+
+
+def _batches(samples: Iterator[Dict[str, Any]],
+             batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        batch = list(islice(samples, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        'count': 0,
+        'best': 0.0,
+        'models': {name: 0.0 for name, _ in CANDIDATES},
+    }
+
+
+def _load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _run_config(path: str, stop: Optional[int],
+                shard: Optional[Tuple[int, int]],
+                top_k: Optional[int]) -> Dict[str, Any]:
+    return {'dataset': os.path.abspath(path), 'stop': stop,
+            'shard': list(shard) if shard is not None else None,
+            'top_k': top_k}
+
+
+def _save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def averages(totals: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Mean faithfulness score per model, and of the best answer.
+    """
+    count = totals['count'] or 1
+    means = {name: total / count for name, total in totals['models'].items()}
+    means['best'] = totals['best'] / count
+    return means
+
+
+def run_dataset(path: str,
+                output_path: str,
+                batch_size: int = 8,
+                limit: Optional[int] = None,
+                checkpoint_path: Optional[str] = None,
+                verbose: bool = True,
+                stop: Optional[int] = None,
+                shard: Optional[Tuple[int, int]] = None,
+                top_k: Optional[int] = None) -> Dict[str, float]:
+    """
+    Evaluates every sample of a JSONL dataset and appends one result per
+    line to output_path.
+    Args:
+        path (str): Input JSONL with context, question and answer fields.
+        output_path (str): Output JSONL; appended to when resuming.
+        batch_size (int): Samples per batch passed to score_candidates.
+        limit (Optional[int]): Stop after this many samples in total.
+        checkpoint_path (Optional[str]): Checkpoint file, defaults to
+            output_path + '.ckpt'.
+        verbose (bool): Print running averages after every batch.
+        stop (Optional[int]): Ignore input lines from this index on.
+        shard (Optional[Tuple[int, int]]): (k, n) to process only the
+            lines whose index is k mod n.
+        top_k (Optional[int]): Context chunks to keep, see
+            models.prepare_contexts.
+    Returns:
+        Dict[str, float]: Mean score per model and of the best answer.
+    Raises:
+        ValueError: If the checkpoint was written for another dataset,
+            stop, shard or top_k.
+    """
+    checkpoint_path = checkpoint_path or output_path + '.ckpt'
+    config = _run_config(path, stop, shard, top_k)
+    state = _load_checkpoint(checkpoint_path)
+    if state is None:
+        state = {'config': config, 'position': 0, 'output_bytes': 0,
+                 'totals': _empty_totals()}
+    elif state.get('config') != config:
+        raise ValueError(f'{checkpoint_path} was written for '
+                         f'{state.get("config")}, not {config}; delete it '
+                         f'and {output_path} to start over')
+
+    samples: Iterator[Dict[str, Any]] = iter_samples(
+        path, state['position'], stop=stop, shard=shard)
+    if limit is not None:
+        samples = islice(samples, max(0, limit - state['totals']['count']))
+
+    with open(output_path, 'a+', encoding='utf-8') as out:
+        # Drop anything written after the last checkpoint.
+        out.truncate(state['output_bytes'])
+        out.seek(state['output_bytes'])
+        for batch in _batches(samples, batch_size):
+            scored = score_candidates(
+                [(s['context'], s['question']) for s in batch], batch_size,
+                top_k)
+            totals = state['totals']
+            for sample, judged in zip(batch, scored):
+                best_name = max(judged, key=lambda name: judged[name][1])
+                result = {
+                    'index': sample['index'],
+                    'question': sample['question'],
+                    'gold_answer': sample['gold_answer'],
+                    'predicted_answer': judged[best_name][0],
+                    'score': judged[best_name][1],
+                    'model': best_name,
+                    'candidates': {name: {'answer': answer, 'score': score}
+                                   for name, (answer, score) in judged.items()},
+                }
+                out.write(json.dumps(result) + '\n')
+                totals['count'] += 1
+                totals['best'] += result['score']
+                for name, (_, score) in judged.items():
+                    totals['models'][name] += score
+            out.flush()
+            os.fsync(out.fileno())
+            state['position'] = batch[-1]['index'] + 1
+            state['output_bytes'] = out.tell()
+            _save_checkpoint(checkpoint_path, state)
+            if verbose:
+                means = averages(totals)
+                label = f'shard {shard[0]} ' if shard is not None else ''
+                print(f"[{label}{totals['count']}] " + ', '.join(
+                    f'{name}: {mean:.3f}' for name, mean in means.items()))
+    return averages(state['totals'])
+
+
+def _init_worker(threads: int, store_dir: Optional[str]) -> None:
+    # Pin the torch thread pool and load every model once per process.
+    import torch
+    import models
+    torch.set_num_threads(threads)
+    context_store.use_store(store_dir)
+    models.warm_up()
+
+
+def _run_shard(path: str, output_path: str, shard: Tuple[int, int],
+               batch_size: int, stop: Optional[int],
+               top_k: Optional[int]) -> Tuple[Dict[str, Any], int]:
+    # The shard's totals, and how many of its samples this call scored.
+    checkpoint_path = output_path + '.ckpt'
+    before = _load_checkpoint(checkpoint_path)
+    run_dataset(path, output_path, batch_size=batch_size, stop=stop,
+                shard=shard, verbose=False, top_k=top_k)
+    state = _load_checkpoint(checkpoint_path)
+    if state is None:
+        return _empty_totals(), 0
+    done_before = before['totals']['count'] if before else 0
+    return state['totals'], state['totals']['count'] - done_before
+
+
+def _read_results(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def run_dataset_parallel(path: str,
+                         output_path: str,
+                         workers: int = 4,
+                         threads_per_worker: Optional[int] = None,
+                         batch_size: int = 8,
+                         limit: Optional[int] = None,
+                         top_k: Optional[int] = None,
+                         store_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Shards the dataset round-robin across worker processes, each with its
+    own models and a pinned torch thread count, then merges the per-shard
+    outputs into output_path in input order. Every shard checkpoints on
+    its own, so an interrupted parallel run also resumes; shards left by
+    a run with another worker count, limit or top_k are refused rather
+    than merged.
+    Args:
+        path (str): Input JSONL with context, question and answer fields.
+        output_path (str): Merged output JSONL.
+        workers (int): Number of worker processes.
+        threads_per_worker (Optional[int]): torch threads per worker;
+            defaults to the CPU count divided by workers.
+        batch_size (int): Samples per batch inside each worker.
+        limit (Optional[int]): Only evaluate the first limit lines.
+        top_k (Optional[int]): Context chunks to keep, see
+            models.prepare_contexts.
+        store_dir (Optional[str]): Context store built by context_store.py
+            for the workers to read token IDs and embeddings from.
+    Returns:
+        Dict[str, Any]: Mean scores per model, the sample count, the
+        number of samples scored by this call, the elapsed time and the
+        throughput of this call in samples per second.
+    Raises:
+        ValueError: If a shard checkpoint was written for other settings.
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    shard_paths = [f'{output_path}.shard{k}' for k in range(workers)]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker,
+                             initargs=(threads_per_worker,
+                                       store_dir)) as executor:
+        futures = [executor.submit(_run_shard, path, shard_path,
+                                   (k, workers), batch_size, limit, top_k)
+                   for k, shard_path in enumerate(shard_paths)]
+        shard_results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    # Each shard file is already sorted by index.
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for result in heapq.merge(*map(_read_results, shard_paths),
+                                  key=lambda r: r['index']):
+            out.write(json.dumps(result) + '\n')
+
+    totals = _empty_totals()
+    processed = 0
+    for shard, scored in shard_results:
+        processed += scored
+        totals['count'] += shard['count']
+        totals['best'] += shard['best']
+        for name, total in shard['models'].items():
+            totals['models'][name] += total
+    return {
+        'means': averages(totals),
+        'samples': totals['count'],
+        'processed': processed,
+        'seconds': elapsed,
+        'samples_per_second': processed / elapsed if elapsed else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('dataset', nargs='?', default='quac_simple_val.jsonl')
+    parser.add_argument('output', nargs='?', default='quac_results.jsonl')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--top-k', type=int, default=None)
+    parser.add_argument('--store', default=None,
+                        help='context store built by context_store.py')
+    args = parser.parse_args()
+    context_store.use_store(args.store)
+    if args.workers > 1:
+        report = run_dataset_parallel(args.dataset, args.output,
+                                      workers=args.workers,
+                                      threads_per_worker=args.threads_per_worker,
+                                      batch_size=args.batch_size,
+                                      limit=args.limit,
+                                      top_k=args.top_k,
+                                      store_dir=args.store)
+        print(f"{report['processed']} samples in {report['seconds']:.1f}s "
+              f"({report['samples_per_second']:.2f} samples/s)")
+        print(report['means'])
+    else:
+        print(run_dataset(args.dataset, args.output,
+                          batch_size=args.batch_size, limit=args.limit,
+                          top_k=args.top_k))
@@ -0,0 +1,222 @@
+"""
+Asyncio HTTP server for answer_question with dynamic micro-batching.
+
+Requests are queued and a single batching loop groups them into
+micro-batches of at most max_batch_size, waiting at most max_wait_ms for
+a batch to fill. Each batch goes through models.answer_questions in a
+worker thread, and every request's future is resolved with its own
+result. A bounded queue gives backpressure: when it is full, new requests
+are rejected with 503 instead of piling up.
+
+Endpoints:
+    POST /answer  {"context": ..., "question": ...} -> {"answer", "score"}
+    GET  /health  liveness, always 200
+    GET  /ready   200 once the models are warmed up, 503 before or if
+                  warm-up failed, with the error; also reports queue
+                  depth and resident models
+
+Uses only the standard library:
+    python server.py --port 8000 [--stand-ins]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import model_registry
+import models
+
+Pending = Tuple[str, str, 'asyncio.Future[Tuple[str, float]]']
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+class MicroBatcher:
+    """
+    Queues (context, question) pairs and answers them in micro-batches.
+    """
+
+    def __init__(self, max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 max_queue: int = 256) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: 'asyncio.Queue[Pending]' = asyncio.Queue(max_queue)
+        self.batches = 0
+        self.answered = 0
+
+    async def submit(self, context: str,
+                     question: str) -> Tuple[str, float]:
+        """
+        Queues one request and waits for its answer. Raises
+        asyncio.QueueFull when the queue is at capacity.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((context, question, future))
+        return await future
+
+    async def _next_batch(self) -> List[Pending]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(),
+                                                    remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _answer(self, batch: List[Pending]) -> None:
+        loop = asyncio.get_running_loop()
+        pairs = [(context, question) for context, question, _ in batch]
+        results = await loop.run_in_executor(
+            None, models.answer_questions, pairs, len(pairs))
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._answer(batch)
+            except Exception:
+                # Retry one at a time so an error stays with its request.
+                for pending in batch:
+                    try:
+                        await self._answer([pending])
+                    except Exception as error:
+                        if not pending[2].done():
+                            pending[2].set_exception(error)
+            self.batches += 1
+            self.answered += len(batch)
+
+
+class Server:
+    def __init__(self, batcher: MicroBatcher) -> None:
+        self.batcher = batcher
+        self.ready = False
+        self.warm_up_error: Optional[str] = None
+
+    async def warm_up(self) -> None:
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, models.warm_up)
+        except Exception as error:
+            logger.exception('Warm-up failed')
+            self.warm_up_error = f'{type(error).__name__}: {error}'
+            return
+        self.ready = True
+
+    async def _route(self, method: str, path: str,
+                     body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/ready':
+            status = 200 if self.ready else 503
+            return status, {'ready': self.ready,
+                            'error': self.warm_up_error,
+                            'queued': self.batcher.queue.qsize(),
+                            'batches': self.batcher.batches,
+                            'answered': self.batcher.answered,
+                            'residency': model_registry.residency()}
+        if path != '/answer':
+            return 404, {'error': 'not found'}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        if not self.ready:
+            return 503, {'error': (f'warm-up failed: {self.warm_up_error}'
+                                   if self.warm_up_error
+                                   else 'models are warming up')}
+        try:
+            request = json.loads(body)
+            context, question = request['context'], request['question']
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': 'expected JSON with context and question'}
+        if not isinstance(context, str) or not isinstance(question, str):
+            return 400, {'error': 'context and question must be strings'}
+        try:
+            answer, score = await self.batcher.submit(context, question)
+        except asyncio.QueueFull:
+            return 503, {'error': 'queue full, retry later'}
+        except Exception as error:
+            return 500, {'error': str(error)}
+        return 200, {'answer': answer, 'score': score}
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            method, path, _ = request_line.split(' ', 2)
+            headers: Dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            body = await reader.readexactly(length) if length else b''
+            status, payload = await self._route(method, path, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {'error': 'malformed request'}
+        data = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(data)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('latin-1') + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8000,
+                max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                max_queue: int = 256,
+                started: Optional['asyncio.Future[int]'] = None) -> None:
+    """
+    Runs the server until cancelled. started, if given, receives the bound
+    port once the socket is listening.
+    """
+    app = Server(MicroBatcher(max_batch_size, max_wait_ms, max_queue))
+    server = await asyncio.start_server(app.handle, host, port)
+    tasks = [asyncio.create_task(app.batcher.run()),
+             asyncio.create_task(app.warm_up())]
+    if started is not None:
+        started.set_result(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=10.0)
+    parser.add_argument('--max-queue', type=int, default=256)
+    parser.add_argument('--memory-budget-mb', type=float)
+    parser.add_argument('--stand-ins', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig()
+    if args.memory_budget_mb:
+        model_registry.set_memory_budget(args.memory_budget_mb)
+    if args.stand_ins:
+        import stand_ins
+        stand_ins.install()
+    asyncio.run(serve(args.host, args.port, args.batch_size,
+                      args.max_wait_ms, args.max_queue))
@@ -0,0 +1,168 @@
+"""
+Deterministic, lightweight stand-ins for the Hugging Face models.
+
+They implement the backends.py interfaces (and the tokenizer calls used by
+truncation), so the ensemble logic, batching, caching and benchmarks can
+run offline in seconds. Their answers are cheap heuristics, not model
+predictions.
+"""
+import hashlib
+import math
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import model_registry
+from backends import (ExtractiveQA, Limits, SentenceEmbedder, TextGenerator,
+                      expand_limits)
+
+
+def _stable_hash(text: str) -> int:
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+class StandInTokenizer:
+    """
+    Whitespace tokenizer with a shared vocabulary; decode inverts encode.
+    """
+
+    def __init__(self) -> None:
+        self.vocab: Dict[str, int] = {}
+        self.words: List[str] = []
+
+    def _id(self, word: str) -> int:
+        if word not in self.vocab:
+            self.vocab[word] = len(self.words)
+            self.words.append(word)
+        return self.vocab[word]
+
+    def encode(self, text: str, text_pair: str = '',
+               truncation: bool = False,
+               max_length: int = 512,
+               add_special_tokens: bool = True) -> List[int]:
+        ids = [self._id(w) for w in (text + ' ' + text_pair).split()]
+        return ids[:max_length] if truncation else ids
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 0
+
+    def __call__(self, text: str, add_special_tokens: bool = True,
+                 return_offsets_mapping: bool = False) -> Dict[str, Any]:
+        spans = [m.span() for m in re.finditer(r'\S+', text)]
+        encoding: Dict[str, Any] = {
+            'input_ids': [self._id(text[start:end]) for start, end in spans]}
+        if return_offsets_mapping:
+            encoding['offset_mapping'] = spans
+        return encoding
+
+    def decode(self, ids: List[int], skip_special_tokens: bool = True) -> str:
+        return ' '.join(self.words[i] for i in ids)
+
+
+class StandInQA(ExtractiveQA):
+    """
+    Extractive QA stand-in: answers with the context sentence sharing the
+    most words with the question, and reports the overlap as its score.
+    """
+
+    def _answer(self, question: str, context: str) -> Tuple[str, float]:
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', context)
+                     if s.strip()]
+        if not sentences:
+            raise ValueError('empty context')
+        asked = set(_words(question))
+        best = max(sentences, key=lambda s: len(asked & set(_words(s))))
+        overlap = len(asked & set(_words(best))) / max(1, len(asked))
+        return best, overlap
+
+    def _predict(self, questions: List[str], contexts: List[str],
+                 batch_size: int) -> List[Tuple[str, float]]:
+        return [self._answer(q, c) for q, c in zip(questions, contexts)]
+
+
+class StandInText2Text(TextGenerator):
+    """
+    Text2text stand-in. Judge prompts (ending in a rating instruction) get
+    a score derived from word overlap between answer and context; any other
+    prompt gets the first words of its context, capped at max_new_tokens.
+    """
+
+    def _judge_score(self, prompt: str) -> float:
+        context, _, rest = prompt[len('Context:\n'):].partition(
+            '\n\nQuestion: ')
+        answer = rest.partition('\nAnswer: ')[2].partition('\n\n')[0]
+        answer_words = set(_words(answer))
+        support = (len(answer_words & set(_words(context)))
+                   / max(1, len(answer_words)))
+        jitter = (_stable_hash(prompt) % 3 - 1) / 10
+        return min(1.0, max(-1.0, 2 * support - 1 + jitter))
+
+    def _generate(self, prompt: str, max_new_tokens: int) -> str:
+        if prompt.startswith('Context:\n'):
+            return f'{round(self._judge_score(prompt), 1):g}'
+        context = prompt.partition('Based on the context: ')[2]
+        context = context.rpartition(';')[0] or context
+        return ' '.join(context.split()[:max_new_tokens])
+
+    def generate(self, prompts: List[str], max_new_tokens: Limits,
+                 batch_size: int = 8) -> List[str]:
+        return [self._generate(prompt, limit) for prompt, limit in
+                zip(prompts, expand_limits(max_new_tokens, len(prompts)))]
+
+    def grid_probabilities(self, prompts: List[str], grid: Sequence[float],
+                           batch_size: int = 8) -> List[List[float]]:
+        # A softmax peaked at the grid value nearest the overlap score.
+        probabilities = []
+        for prompt in prompts:
+            score = self._judge_score(prompt)
+            weights = [math.exp(-4 * abs(value - score)) for value in grid]
+            total = sum(weights)
+            probabilities.append([w / total for w in weights])
+        return probabilities
+
+
+class StandInSentenceModel(SentenceEmbedder):
+    """
+    Sentence-embedding stand-in: hashed bag-of-words vectors.
+    """
+
+    def __init__(self, dimensions: int = 64) -> None:
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in _words(text):
+            vector[_stable_hash(word) % self.dimensions] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray([self._embed(text) for text in texts],
+                          dtype=np.float32).reshape(len(texts),
+                                                    self.dimensions)
+
+
+def install() -> None:
+    """
+    Replaces every model used by models.py and Evaluation.py with a
+    stand-in. Call before the first request. Judge scores are keyed on the
+    real model IDs, so the score cache is switched to memory-only to keep
+    stand-in scores out of the persistent cache.
+    """
+    import models
+    import Evaluation
+    from judge_cache import score_cache
+    score_cache.use_memory_only()
+    text2text = StandInText2Text()
+    model_registry.install(models.qa_pipeline, StandInQA())
+    model_registry.install(models.bert_pipeline, StandInQA())
+    model_registry.install(models.flan, text2text)
+    for tokenizer in models.MODEL_TOKENIZERS.values():
+        model_registry.install(tokenizer, StandInTokenizer())
+    model_registry.install(Evaluation.faithfulness_model_2, text2text)
+    model_registry.install(Evaluation.embedding_model, StandInSentenceModel())
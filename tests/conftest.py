@@ -0,0 +1,4 @@
+import os
+
+# Keep test runs from creating or reading ./judge_cache.sqlite3.
+os.environ['JUDGE_CACHE_PATH'] = ''
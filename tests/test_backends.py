@@ -0,0 +1,40 @@
+import unittest
+
+import backends
+
+
+class FlakyQA(backends.ExtractiveQA):
+    def _predict(self, questions, contexts, batch_size):
+        if any(not context for context in contexts):
+            raise ValueError('empty context')
+        return [(context.split()[0], 1.0) for context in contexts]
+
+
+class BrokenQA(backends.ExtractiveQA):
+    def _predict(self, questions, contexts, batch_size):
+        raise TypeError('bug')
+
+
+class TestBackends(unittest.TestCase):
+    def test_missing_method_fails_on_construction(self) -> None:
+        """Test that a backend without its model method cannot be built."""
+        for interface in (backends.ExtractiveQA, backends.TextGenerator,
+                          backends.SentenceEmbedder):
+            with self.subTest(interface=interface.__name__):
+                incomplete = type('Incomplete', (interface,), {})
+                with self.assertRaises(TypeError):
+                    incomplete()
+
+    def test_failing_pair_is_isolated(self) -> None:
+        """Test that only the pair the model cannot handle is unanswered."""
+        self.assertEqual(FlakyQA().answer(['q', 'q'], ['Ada wrote', '']),
+                         [('Ada', 1.0), ('CANNOTANSWER', None)])
+
+    def test_bugs_propagate(self) -> None:
+        """Test that programming errors are not turned into answers."""
+        with self.assertRaises(TypeError):
+            BrokenQA().answer(['q'], ['c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import model_registry
+import context_selection
+from Evaluation import embedding_model
+from stand_ins import StandInSentenceModel
+
+
+class TestContextSelection(unittest.TestCase):
+    def setUp(self) -> None:
+        model_registry.install(embedding_model, StandInSentenceModel())
+
+    def tearDown(self) -> None:
+        model_registry.unload_all()
+        context_selection._chunk_embeddings.cache_clear()
+
+    def test_chunk_spans_overlap(self) -> None:
+        """Test that chunks overlap and cover every word."""
+        spans = context_selection.chunk_spans(25, chunk_words=10, overlap=3)
+        self.assertEqual(spans, [(0, 10), (7, 17), (14, 24), (21, 25)])
+
+    def test_select_context_keeps_relevant_chunk(self) -> None:
+        """Test that the chunk about the question is selected."""
+        filler = ' '.join(['lorem ipsum dolor sit amet'] * 20)
+        context = filler + ' The treaty was signed in Vienna. ' + filler
+        selected = context_selection.select_context(
+            context, 'Where was the treaty signed?', top_k=1,
+            chunk_words=20, overlap=5)
+        self.assertIn('Vienna', selected)
+        self.assertLess(len(selected.split()), len(context.split()))
+
+
+if __name__ == '__main__':
+    unittest.main()
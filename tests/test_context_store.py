@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import context_store
+import model_registry
+import models
+import stand_ins
+
+
+class RecordingTokenizer:
+    def __init__(self, tokenizer) -> None:
+        self.tokenizer = tokenizer
+        self.texts = []
+
+    def __call__(self, text, **kwargs):
+        self.texts.append(text)
+        return self.tokenizer(text, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+
+class TestContextStore(unittest.TestCase):
+    def setUp(self) -> None:
+        stand_ins.install()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dataset = os.path.join(self.tmp.name, 'data.jsonl')
+        with open(self.dataset, 'w', encoding='utf-8') as f:
+            for question in ('Who?', 'When?', 'Where?'):
+                f.write(json.dumps({'context': 'Ada wrote the notes in 1843.',
+                                    'question': question,
+                                    'answer': ''}) + '\n')
+
+    def tearDown(self) -> None:
+        context_store.use_store(None)
+        model_registry.unload_all()
+        self.tmp.cleanup()
+
+    def test_build_and_lookup(self) -> None:
+        """Test that contexts are deduplicated and read back memory-mapped."""
+        store_dir = os.path.join(self.tmp.name, 'store')
+        counts = context_store.build_store(self.dataset, store_dir)
+        self.assertEqual(counts, {'lines': 3, 'contexts': 1})
+        store = context_store.use_store(store_dir)
+        ends = store.token_ends('flan', 'Ada wrote the notes in 1843.')
+        self.assertIsInstance(ends, np.memmap)
+        self.assertEqual(list(ends), [3, 9, 13, 19, 22, 28])
+        self.assertIsNone(store.token_ends('flan', 'unknown context'))
+
+    def test_truncate_context_reads_store(self) -> None:
+        """Test that a stored context is truncated without tokenizing it."""
+        store_dir = os.path.join(self.tmp.name, 'store')
+        context_store.build_store(self.dataset, store_dir)
+        context_store.use_store(store_dir)
+        models.truncator.clear()
+        tokenizer = RecordingTokenizer(models.truncator.tokenizers['flan'])
+        with mock.patch.dict(models.truncator.tokenizers, {'flan': tokenizer}):
+            truncated = models.truncate_context(
+                'Ada wrote the notes in 1843.', 'Who?', max_length=4)
+        models.truncator.clear()
+        self.assertEqual(truncated, 'Ada wrote the')
+        self.assertEqual(tokenizer.texts, ['Who?'])
+
+    def test_refuses_mismatched_store(self) -> None:
+        """Test that a store built for other models is not used."""
+        store_dir = os.path.join(self.tmp.name, 'store')
+        context_store.build_store(self.dataset, store_dir)
+        index_path = os.path.join(store_dir, 'index.json')
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        changes = [('tokenizers', dict(index['tokenizers'], flan='t5-base')),
+                   ('embedding_model', 'all-mpnet-base-v2'),
+                   ('embedding_dimensions', index['embedding_dimensions'] + 1)]
+        for key, value in changes:
+            with self.subTest(key=key):
+                with open(index_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(index, **{key: value}), f)
+                with self.assertRaises(ValueError):
+                    context_store.use_store(store_dir)
+                self.assertIsNone(context_store.active_store())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+
+import dataset_io
+from convert import convert_quac_to_simple_format
+
+
+class TestDatasetIO(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.quac = os.path.join(self.tmp.name, 'quac.json')
+        data = {'data': [
+            {'paragraphs': [{'context': f'Context {a}.', 'qas': [
+                {'question': f'q{a}{i}', 'answers': [{'text': f'a{a}{i}'}]}
+                for i in range(3)]}]}
+            for a in range(2)]}
+        data['data'][1]['paragraphs'][0]['qas'][2] = {
+            'question': 'q12', 'is_impossible': True}
+        with open(self.quac, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_streaming_articles(self) -> None:
+        """Test that articles are parsed correctly from small read chunks."""
+        articles = list(dataset_io.iter_quac_articles(self.quac,
+                                                      chunk_size=7))
+        self.assertEqual(len(articles), 2)
+        self.assertEqual(articles[1]['paragraphs'][0]['context'],
+                         'Context 1.')
+
+    def test_layouts_read_the_same(self) -> None:
+        """Test that flat, gzipped and normalized outputs yield the same records."""
+        flat = os.path.join(self.tmp.name, 'flat.jsonl')
+        flat_gz = os.path.join(self.tmp.name, 'flat.jsonl.gz')
+        normalized = os.path.join(self.tmp.name, 'normalized')
+        convert_quac_to_simple_format(self.quac, flat)
+        convert_quac_to_simple_format(self.quac, flat_gz)
+        convert_quac_to_simple_format(self.quac, normalized, normalized=True,
+                                      shard_size=4, compress=True)
+        expected = list(dataset_io.iter_records(flat))
+        self.assertEqual(len(expected), 6)
+        self.assertEqual(expected[5][1]['answer'], 'impossible')
+        self.assertEqual(list(dataset_io.iter_records(flat_gz)), expected)
+        self.assertEqual(list(dataset_io.iter_records(normalized)), expected)
+        self.assertEqual(list(dataset_io.iter_records(normalized, 1, 5, (1, 2))),
+                         [expected[1], expected[3]])
+
+        _, manifest = dataset_io.read_manifest(normalized)
+        self.assertEqual((manifest['n_contexts'], manifest['n_questions']),
+                         (2, 6))
+        self.assertEqual(len(manifest['questions']), 2)
+        self.assertEqual(sorted(dataset_io.iter_contexts(normalized)),
+                         ['Context 0.', 'Context 1.'])
+
+    def test_only_kept_lines_are_parsed(self) -> None:
+        """Test that lines outside the range or shard are never parsed."""
+        flat = os.path.join(self.tmp.name, 'flat.jsonl')
+        with open(flat, 'w', encoding='utf-8') as f:
+            for i in range(6):
+                f.write('not json\n' if i % 2 else json.dumps(
+                    {'context': 'c', 'question': f'q{i}'}) + '\n')
+        self.assertEqual([i for i, _ in dataset_io.iter_records(
+            flat, shard=(0, 2))], [0, 2, 4])
+        self.assertEqual([i for i, _ in dataset_io.iter_records(
+            flat, start=2, stop=3)], [2])
+
+    def test_gzip_flat_output(self) -> None:
+        """Test that compress gzips flat output and appends .gz."""
+        flat = os.path.join(self.tmp.name, 'flat.jsonl')
+        convert_quac_to_simple_format(self.quac, flat, compress=True)
+        self.assertFalse(os.path.exists(flat))
+        self.assertEqual(len(list(dataset_io.iter_records(flat + '.gz'))), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
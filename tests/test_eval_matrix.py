@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+import eval_matrix
+
+
+def fake_judge_prompts(prompts, max_new_tokens, batch_size=1, mode=None):
+    return [0.5 if 'Answer: CANNOTANSWER' in prompt else 1.0
+            for prompt in prompts]
+
+
+class TestEvalMatrix(unittest.TestCase):
+    @mock.patch('eval_matrix.Evaluation.judge_prompts')
+    def test_cells_computed_once(self, judge_prompts) -> None:
+        """Test that derived columns reuse base cells and MAE uses stored scores."""
+        judge_prompts.side_effect = fake_judge_prompts
+        samples = [('q', 'An answer.', 'context'), ('q', 'CANNOTANSWER', 'c')]
+        cells = eval_matrix.plan_cells(samples)
+        self.assertEqual(len(cells), 2 * 5)
+        self.assertEqual(len(set(cells)), len(cells))
+
+        frame = eval_matrix.evaluate_matrix(samples, targets=[1, 0],
+                                            workers=2)
+        prompts = sum(len(call.args[0])
+                      for call in judge_prompts.call_args_list)
+        self.assertEqual(prompts, len(cells))
+        self.assertEqual(list(frame['average']), [1.0, 0.5])
+        self.assertEqual(list(frame['hybrid_shorter_or_cannotanswer']),
+                         [1.0, 0.5])
+        errors = eval_matrix.mean_absolute_errors(frame)
+        self.assertAlmostEqual(errors['vanilla'], 0.25)
+
+    def test_hybrid_only_needs_one_variant(self) -> None:
+        """Test that the hybrid column plans one cell per sample."""
+        samples = [('q', 'An answer.', 'c'), ('q', 'CANNOTANSWER', 'c')]
+        self.assertEqual(
+            eval_matrix.plan_cells(samples,
+                                   ['hybrid_shorter_or_cannotanswer']),
+            [(0, 'shorter_scale'), (1, 'cannotanswer_explicit')])
+
+    @mock.patch('eval_matrix.Evaluation.judge_prompts')
+    def test_failed_chunk(self, judge_prompts) -> None:
+        """Test that a failing chunk raises, or is logged and left NaN."""
+        judge_prompts.side_effect = RuntimeError('judge down')
+        samples = [('q', 'An answer.', 'c')]
+        with self.assertRaises(RuntimeError):
+            eval_matrix.evaluate_matrix(samples, ['vanilla'])
+        with self.assertLogs('eval_matrix', level='ERROR'):
+            frame = eval_matrix.evaluate_matrix(samples, ['vanilla'],
+                                                on_error='nan')
+        self.assertTrue(frame['vanilla'].isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
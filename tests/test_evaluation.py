@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+
+import Evaluation
+import model_registry
+import stand_ins
+from judge_cache import score_cache
+
+
+class TestBatchedVariants(unittest.TestCase):
+    def setUp(self) -> None:
+        stand_ins.install()
+        score_cache.clear()
+        self.addCleanup(score_cache.clear)
+        self.sample = ('Who wrote the notes?', 'Ada wrote the notes',
+                       'Ada Lovelace wrote the notes in 1843.')
+
+    def test_batched_matches_single_variants(self) -> None:
+        """Test that one batch over mixed limits scores like one call per variant."""
+        judge = model_registry.get(*Evaluation.faithfulness_model_1.key)
+        with mock.patch.object(judge, 'generate',
+                               wraps=judge.generate) as generate:
+            batched = Evaluation.evaluate_variants(*self.sample)
+        limits = generate.call_args_list[0].args[1]
+        self.assertEqual(limits, [Evaluation.VARIANTS[v][1]
+                                  for v in Evaluation.AVERAGE_VARIANTS])
+        self.assertGreater(len(set(limits)), 1)
+
+        score_cache.clear()
+        single = {variant: Evaluation.evaluate_variant(variant, *self.sample)
+                  for variant in Evaluation.AVERAGE_VARIANTS}
+        self.assertEqual(batched, single)
+
+        score_cache.clear()
+        average = Evaluation.evaluate_average(*self.sample)
+        self.assertEqual(average,
+                         round(sum(single.values()) / len(single), 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from judge_cache import JudgeCache, make_key
+
+
+class TestJudgeCache(unittest.TestCase):
+    def test_memory_lru(self) -> None:
+        """Test that the memory tier evicts the least recently used key."""
+        cache = JudgeCache(None, max_entries=2)
+        cache.put('a', 0.5)
+        cache.put('b', -0.5)
+        cache.get('a')
+        cache.put('c', 1.0)
+        self.assertEqual(cache.get('a'), 0.5)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_disk_tier_survives_restart(self) -> None:
+        """Test that scores are read back from SQLite by a new cache."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'scores.sqlite3')
+            key = make_key('judge', 'base', 'large', 10, 'prompt')
+            JudgeCache(path).put(key, 0.25)
+            cache = JudgeCache(path)
+            self.assertEqual(cache.get(key), 0.25)
+            self.assertEqual(cache.stats()['disk_hits'], 1)
+            cache._db.close()
+
+    def test_memory_only_detaches_disk(self) -> None:
+        """Test that use_memory_only neither reads nor writes SQLite."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'scores.sqlite3')
+            old = make_key('judge', 'old')
+            JudgeCache(path).put(old, 0.5)
+            cache = JudgeCache(path)
+            cache.use_memory_only()
+            cache.put(make_key('judge', 'new'), 1.0)
+            self.assertIsNone(cache.get(old))
+            self.assertIsNone(JudgeCache(path).get(make_key('judge', 'new')))
+
+
+if __name__ == '__main__':
+    unittest.main()
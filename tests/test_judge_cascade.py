@@ -0,0 +1,67 @@
+import unittest
+
+import Evaluation
+import stand_ins
+from judge_cache import score_cache
+
+
+class TestJudgeCascade(unittest.TestCase):
+    def test_escalation_rule(self) -> None:
+        """Test that unparseable, near-zero and low-confidence outputs escalate."""
+        rule = {'unparseable': True, 'near_zero': 0.2, 'min_confidence': 0.6}
+        self.assertTrue(Evaluation.needs_large_judge(None, None, rule))
+        self.assertTrue(Evaluation.needs_large_judge(0.1, None, rule))
+        self.assertTrue(Evaluation.needs_large_judge(0.9, 0.5, rule))
+        self.assertFalse(Evaluation.needs_large_judge(0.9, 0.8, rule))
+        self.assertFalse(Evaluation.needs_large_judge(-0.5, None, rule))
+
+    def test_cascade_only_judges_escalated(self) -> None:
+        """Test that the large judge sees only escalated prompts and is averaged in."""
+        asked = []
+
+        def large_score(indices):
+            asked.extend(indices)
+            return [1.0] * len(indices)
+
+        scores, escalated = Evaluation._cascade(
+            [(0.8, None), (None, None), (0.0, None), (-1.0, None)],
+            large_score)
+        self.assertEqual(asked, [1, 2])
+        self.assertEqual(escalated, [1, 2])
+        self.assertEqual(scores, [0.8, 0.5, 0.5, -1.0])
+
+
+class TestLogitsMode(unittest.TestCase):
+    def setUp(self) -> None:
+        stand_ins.install()
+        score_cache.clear()
+        self.prompt = Evaluation.build_prompt(
+            'vanilla', 'Who wrote the notes?', 'Ada wrote them',
+            'Ada wrote the notes in 1843.')
+
+    def test_expected_score(self) -> None:
+        """Test that logits mode scores the probability-weighted grid mean."""
+        probs = stand_ins.StandInText2Text().grid_probabilities(
+            [self.prompt], Evaluation.SCORE_GRID)[0]
+        expected = sum(p * v for p, v in zip(probs, Evaluation.SCORE_GRID))
+        score = Evaluation.judge_prompts([self.prompt], 64, mode='logits',
+                                         strategy='both')[0]
+        self.assertAlmostEqual(score, round(expected, 3))
+        self.assertNotIn(score, Evaluation.SCORE_GRID)
+
+    def test_keys_separate_modes(self) -> None:
+        """Test that logits scores are cached apart from generated ones."""
+        logits_key = Evaluation._score_key(self.prompt, 64, 'logits')
+        self.assertNotEqual(logits_key,
+                            Evaluation._score_key(self.prompt, 64, 'generate'))
+        self.assertEqual(logits_key,
+                         Evaluation._score_key(self.prompt, 8, 'logits'))
+        logits = Evaluation.judge_prompts([self.prompt], 64, mode='logits',
+                                          strategy='both')
+        generated = Evaluation.judge_prompts([self.prompt], 64,
+                                             mode='generate', strategy='both')
+        self.assertNotEqual(logits, generated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+import model_registry
+
+
+class FakeTensor:
+    def __init__(self, mb: int) -> None:
+        self.mb = mb
+
+    def numel(self) -> int:
+        return self.mb * 2 ** 20
+
+    def element_size(self) -> int:
+        return 1
+
+
+class FakeModel:
+    def __init__(self, mb: int) -> None:
+        self.weights = FakeTensor(mb)
+
+    def state_dict(self):
+        return {'weight': self.weights}
+
+
+class TestModelRegistry(unittest.TestCase):
+    def test_handles_are_shared_and_lazy(self) -> None:
+        """Test that a model ID maps to one handle and is not loaded eagerly."""
+        first = model_registry.pipeline('text2text-generation',
+                                        'never-loaded/model')
+        second = model_registry.pipeline('text2text-generation',
+                                         'never-loaded/model')
+        self.assertIs(first, second)
+        self.assertFalse(first.loaded)
+
+    def test_shared_instance(self) -> None:
+        """Test that get returns the same instance on every call."""
+        key = (model_registry.PIPELINE, 'stand-in', 'test')
+        handle = model_registry.LazyModel(*key)
+        model_registry.install(handle, object())
+        try:
+            self.assertIs(handle.load(), model_registry._instances[key])
+            self.assertTrue(handle.loaded)
+        finally:
+            model_registry._drop(key)
+
+    def test_set_backend_drops_pipelines(self) -> None:
+        """Test that switching backend reloads pipelines but keeps tokenizers."""
+        pipe = model_registry.LazyModel(model_registry.PIPELINE,
+                                        'backend/pipe', 'test')
+        tok = model_registry.LazyModel(model_registry.TOKENIZER,
+                                       'backend/tok')
+        model_registry.install(pipe, object())
+        model_registry.install(tok, object())
+        try:
+            model_registry.set_backend(model_registry.INT8)
+            self.assertFalse(pipe.loaded)
+            self.assertTrue(tok.loaded)
+            with self.assertRaises(ValueError):
+                model_registry.set_backend('fp16')
+        finally:
+            model_registry.set_backend(model_registry.FP32)
+            model_registry._drop(tok.key)
+
+    def test_footprint_counts_packed_and_tied_weights(self) -> None:
+        """Test that packed quantized weights count and tied weights count once."""
+        class Quantized:
+            def state_dict(self):
+                shared = FakeTensor(2)
+                return {'embed': shared, 'lm_head': shared,
+                        'linear._packed_params': (FakeTensor(3), FakeTensor(1)),
+                        'linear.dtype': 'qint8'}
+
+        self.assertEqual(model_registry.footprint_mb(Quantized()), 6)
+
+    def test_memory_budget_evicts_least_recently_used(self) -> None:
+        """Test that loads over the budget evict the least recently used model."""
+        handles = [model_registry.LazyModel(model_registry.PIPELINE,
+                                            f'budget/{i}', 'test')
+                   for i in range(3)]
+        model_registry.set_memory_budget(250)
+        try:
+            model_registry.install(handles[0], FakeModel(100))
+            model_registry.install(handles[1], FakeModel(100))
+            handles[0].load()
+            model_registry.install(handles[2], FakeModel(100))
+            self.assertTrue(handles[0].loaded)
+            self.assertFalse(handles[1].loaded)
+            self.assertTrue(handles[2].loaded)
+            last = model_registry.events[-1]
+            self.assertEqual((last['event'], last['model_id']),
+                             ('evict', 'budget/1'))
+            self.assertLessEqual(model_registry.resident_mb(), 250)
+        finally:
+            model_registry.set_memory_budget(None)
+            for handle in handles:
+                if handle.loaded:
+                    model_registry._drop(handle.key)
+
+    def test_warm_up_stops_at_budget(self) -> None:
+        """Test that warm-up keeps the first models and never evicts."""
+        handles = [model_registry.LazyModel(model_registry.PIPELINE,
+                                            f'warm/{i}', 'test')
+                   for i in range(5)]
+        loads = []
+
+        def load(kind, model_id, task):
+            loads.append(model_id)
+            return FakeModel(400)
+
+        model_registry.set_memory_budget(1000)
+        model_registry.events.clear()
+        try:
+            with mock.patch('model_registry._load', load):
+                model_registry.warm_up(handles)
+            self.assertEqual([h.loaded for h in handles],
+                             [True, True, False, False, False])
+            self.assertEqual(loads, ['warm/0', 'warm/1', 'warm/2'])
+            self.assertEqual([(e['event'], e['model_id'])
+                              for e in model_registry.events],
+                             [('load', 'warm/0'), ('load', 'warm/1')])
+        finally:
+            model_registry.set_memory_budget(None)
+            for handle in handles:
+                if handle.loaded:
+                    model_registry._drop(handle.key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,35 @@
+import json
+import os
+import tempfile
 import unittest
-from models import truncate_context, answer_question
+from unittest import mock
+import models
+import stand_ins
+import tracing
+from judge_cache import score_cache
+from models import truncate_context, answer_question, answer_questions
+
+# Set REAL_MODELS=1 to run against the Hugging Face weights instead of
+# the offline stand-ins.
+REAL_MODELS = os.environ.get('REAL_MODELS') == '1'
+
+
+def expected_answer(real: str, sentence: str) -> str:
+    # The stand-in QA models answer with the best-matching sentence.
+    return real if REAL_MODELS else sentence
 
 
 class TestModels(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        if not REAL_MODELS:
+            stand_ins.install()
+
+    def test_stand_ins_keep_scores_off_disk(self) -> None:
+        """Test that stand-in judge scores never reach the persistent cache."""
+        if not REAL_MODELS:
+            self.assertIsNone(score_cache.path)
+
     def test_truncate_context(self) -> None:
         """Test the truncate_context function."""
         context = "This is a long context that needs to be truncated."
@@ -15,9 +42,122 @@ class TestModels(unittest.TestCase):
         context = "The capital of France is Paris."
         question = "What is the capital of France?"
         answer, score = answer_question(context, question)
-        self.assertEqual(answer, "Paris")
+        self.assertEqual(answer, expected_answer("Paris", context))
         self.assertGreater(score, 0)
 
+    def test_answer_question_concurrent(self) -> None:
+        """Test that the concurrent path matches the sequential one and fills the trace."""
+        context = "The capital of France is Paris. Rome is in Italy."
+        question = "What is the capital of France?"
+        trace = tracing.Trace()
+        concurrent = answer_question(context, question, concurrent=True,
+                                     max_workers=3, trace=trace)
+        self.assertEqual(concurrent, answer_question(context, question))
+        self.assertEqual(set(trace.candidates), {'roberta', 'flan', 'bert'})
+        stages = {stage['stage'] for stage in trace.stages}
+        self.assertTrue({'candidate:roberta', 'candidate:flan',
+                         'candidate:bert'} <= stages)
+
+    def test_concurrent_restores_torch_threads(self) -> None:
+        """Test that the intra-op thread split is undone after the candidates run."""
+        try:
+            import torch
+        except ImportError:
+            self.skipTest('torch is not installed')
+        before = torch.get_num_threads()
+        answer_question("The capital of France is Paris.",
+                        "What is the capital of France?",
+                        concurrent=True, intra_op_threads=1)
+        self.assertEqual(torch.get_num_threads(), before)
+
+    def test_answer_questions(self) -> None:
+        """Test that answer_questions matches answer_question in order."""
+        pairs = [
+            ("The capital of France is Paris.",
+             "What is the capital of France?"),
+            ("The capital of Italy is Rome.",
+             "What is the capital of Italy?"),
+        ]
+        results = answer_questions(pairs, batch_size=2)
+        self.assertEqual(len(results), len(pairs))
+        self.assertEqual(results[0][0], expected_answer("Paris", pairs[0][0]))
+        self.assertEqual(results[1][0], expected_answer("Rome", pairs[1][0]))
+
+
+class TestAnswerCascade(unittest.TestCase):
+    # Candidate answers with their QA confidence, and the judge's score of
+    # each answer.
+    CANDIDATES = {'roberta': ('r', 0.5), 'flan': ('f', None),
+                  'bert': ('b', 0.8)}
+    SCORES = {'r': 0.4, 'f': 0.95, 'b': 0.7}
+
+    def setUp(self) -> None:
+        if not REAL_MODELS:
+            stand_ins.install()
+        self.judged = []
+        self.generated = []
+        patches = [mock.patch('models.predict_candidate', self.predict),
+                   mock.patch('models.Evaluate', self.evaluate)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def predict(self, name, question, context):
+        self.generated.append(name)
+        return self.CANDIDATES[name]
+
+    def evaluate(self, question, answer, context):
+        self.judged.append(answer)
+        return self.SCORES[answer]
+
+    def cascade(self, **kwargs):
+        return models.answer_question_cascade('Ada wrote it.', 'Who?',
+                                              **kwargs)
+
+    def test_stops_at_threshold(self) -> None:
+        """Test that later candidates are not run once one is accepted."""
+        result = self.cascade(threshold=0.9)
+        self.assertEqual(result, models.CascadeResult('f', 0.95, 'flan', 2))
+        self.assertEqual(self.generated, ['roberta', 'flan'])
+
+    def test_returns_best_below_threshold(self) -> None:
+        """Test that the best judged answer wins when none is accepted."""
+        result = self.cascade(threshold=1.0, order=('roberta', 'bert'))
+        self.assertEqual(result, models.CascadeResult('b', 0.7, 'bert', 2))
+
+    def test_skips_low_confidence(self) -> None:
+        """Test that unconfident QA answers are not judged."""
+        result = self.cascade(threshold=1.0, min_confidence=0.6)
+        self.assertEqual(self.judged, ['f', 'b'])
+        self.assertEqual(result.judge_calls, 2)
+
+    def test_falls_back_when_all_skipped(self) -> None:
+        """Test that the most confident answer is judged if all are skipped."""
+        result = self.cascade(order=('roberta', 'bert'), min_confidence=0.9)
+        self.assertEqual(result, models.CascadeResult('b', 0.7, 'bert', 1))
+        self.assertEqual(self.judged, ['b'])
+
+    def test_thresholds_replay_stored_scores(self) -> None:
+        """Test that every threshold is replayed without judging again."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.jsonl')
+            with open(path, 'w', encoding='utf-8') as f:
+                for question in ('Who?', 'When?'):
+                    f.write(json.dumps({'context': 'Ada wrote it.',
+                                        'question': question}) + '\n')
+            report = models.evaluate_cascade_thresholds([0.3, 0.9, 1.0],
+                                                        path)
+            empty = os.path.join(directory, 'empty.jsonl')
+            open(empty, 'w', encoding='utf-8').close()
+            nothing = models.evaluate_cascade_thresholds([0.5], empty)
+        self.assertEqual(len(self.generated), 6)
+        self.assertEqual(len(self.judged), 6)
+        self.assertEqual([r['mean_judge_calls'] for r in report], [1, 2, 3])
+        self.assertEqual([r['stages'] for r in report],
+                         [{'roberta': 2}, {'flan': 2}, {'flan': 2}])
+        self.assertEqual(nothing[0]['samples'], 0)
+        self.assertEqual(nothing[0]['mean_score'], 0.0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import runner
+
+
+def fake_score_candidates(pairs, batch_size=8, top_k=None):
+    return [{'roberta': ('a', 0.5), 'flan': ('b', 1.0), 'bert': ('c', 0.0)}
+            for _ in pairs]
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dataset = os.path.join(self.tmp.name, 'data.jsonl')
+        self.output = os.path.join(self.tmp.name, 'results.jsonl')
+        with open(self.dataset, 'w', encoding='utf-8') as f:
+            for i in range(5):
+                f.write(json.dumps({'context': f'c{i}', 'question': f'q{i}',
+                                    'answer': f'a{i}'}) + '\n')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    @mock.patch('runner.score_candidates', fake_score_candidates)
+    def test_resume(self) -> None:
+        """Test that a resumed run continues after the last checkpoint."""
+        runner.run_dataset(self.dataset, self.output, batch_size=2,
+                           limit=3, verbose=False)
+        means = runner.run_dataset(self.dataset, self.output, batch_size=2,
+                                   verbose=False)
+        with open(self.output, 'r', encoding='utf-8') as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual([r['index'] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual(results[0]['model'], 'flan')
+        self.assertEqual(means['roberta'], 0.5)
+        self.assertEqual(means['best'], 1.0)
+
+    @mock.patch('runner.score_candidates', fake_score_candidates)
+    def test_refuses_other_settings(self) -> None:
+        """Test that a checkpoint is not resumed with other settings."""
+        runner.run_dataset(self.dataset, self.output, batch_size=2,
+                           limit=2, verbose=False)
+        other = os.path.join(self.tmp.name, 'other.jsonl')
+        with open(other, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'context': 'c', 'question': 'q'}) + '\n')
+        for kwargs in ({'top_k': 2}, {'stop': 4}, {'shard': (0, 2)},
+                       {'path': other}):
+            with self.subTest(**{k: str(v) for k, v in kwargs.items()}):
+                with self.assertRaises(ValueError):
+                    runner.run_dataset(**dict({'path': self.dataset},
+                                              **kwargs),
+                                       output_path=self.output,
+                                       verbose=False)
+
+    @mock.patch('runner.score_candidates', fake_score_candidates)
+    def test_shard_counts_only_new_samples(self) -> None:
+        """Test that a resumed shard reports only the samples it scored."""
+        totals, scored = runner._run_shard(self.dataset, self.output, (0, 2),
+                                           2, 3, None)
+        self.assertEqual((totals['count'], scored), (2, 2))
+        totals, scored = runner._run_shard(self.dataset, self.output, (0, 2),
+                                           2, 3, None)
+        self.assertEqual((totals['count'], scored), (2, 0))
+        with self.assertRaises(ValueError):
+            runner._run_shard(self.dataset, self.output, (0, 3), 2, 3, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import server
+
+
+def fake_answer_questions(pairs, batch_size=8, top_k=None):
+    return [(question.upper(), 1.0) for _, question in pairs]
+
+
+class TestServer(unittest.TestCase):
+    @mock.patch('server.models.answer_questions')
+    def test_micro_batching(self, answer_questions) -> None:
+        """Test that concurrent requests share one batch and get their own answers."""
+        answer_questions.side_effect = fake_answer_questions
+
+        async def scenario():
+            batcher = server.MicroBatcher(max_batch_size=4, max_wait_ms=50)
+            worker = asyncio.create_task(batcher.run())
+            results = await asyncio.gather(
+                *(batcher.submit('c', f'q{i}') for i in range(4)))
+            worker.cancel()
+            return results, batcher.batches
+
+        results, batches = asyncio.run(scenario())
+        self.assertEqual(results, [(f'Q{i}', 1.0) for i in range(4)])
+        self.assertEqual(batches, 1)
+        answer_questions.assert_called_once()
+
+    @mock.patch('server.models.answer_questions')
+    def test_failure_stays_with_its_request(self, answer_questions) -> None:
+        """Test that one failing pair does not fail the rest of its batch."""
+        def answer(pairs, batch_size=8, top_k=None):
+            if any(context == 'bad' for context, _ in pairs):
+                raise ValueError('bad context')
+            return fake_answer_questions(pairs, batch_size)
+        answer_questions.side_effect = answer
+
+        async def scenario():
+            batcher = server.MicroBatcher(max_batch_size=3, max_wait_ms=50)
+            worker = asyncio.create_task(batcher.run())
+            results = await asyncio.gather(
+                batcher.submit('c', 'q0'), batcher.submit('bad', 'q1'),
+                batcher.submit('c', 'q2'), return_exceptions=True)
+            worker.cancel()
+            return results
+
+        results = asyncio.run(scenario())
+        self.assertEqual(results[0], ('Q0', 1.0))
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], ('Q2', 1.0))
+
+    def test_rejects_non_string_fields(self) -> None:
+        """Test that a null context is rejected before it is queued."""
+        async def scenario():
+            app = server.Server(server.MicroBatcher())
+            app.ready = True
+            status, _ = await app._route(
+                'POST', '/answer', b'{"context": null, "question": "q"}')
+            return status, app.batcher.queue.qsize()
+
+        self.assertEqual(asyncio.run(scenario()), (400, 0))
+
+    def test_backpressure_and_readiness(self) -> None:
+        """Test that a full queue is rejected and /ready waits for warm-up."""
+        async def scenario():
+            app = server.Server(server.MicroBatcher(max_queue=1))
+            not_ready = await app._route('GET', '/ready', b'')
+            app.ready = True
+            app.batcher.queue.put_nowait(('c', 'q', None))
+            full = await app._route(
+                'POST', '/answer', b'{"context": "c", "question": "q"}')
+            return not_ready[0], full[0]
+
+        self.assertEqual(asyncio.run(scenario()), (503, 503))
+
+    @mock.patch('server.models.warm_up')
+    def test_failed_warm_up_is_reported(self, warm_up) -> None:
+        """Test that a warm-up error is logged and shown by /ready."""
+        warm_up.side_effect = OSError('weights not found')
+
+        async def scenario():
+            app = server.Server(server.MicroBatcher())
+            with self.assertLogs('server', level='ERROR'):
+                await app.warm_up()
+            return (await app._route('GET', '/ready', b''),
+                    await app._route('POST', '/answer', b'{}'))
+
+        (status, payload), (answer_status, answer) = asyncio.run(scenario())
+        self.assertEqual(status, 503)
+        self.assertEqual(payload['error'], 'OSError: weights not found')
+        self.assertEqual(answer_status, 503)
+        self.assertIn('weights not found', answer['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+import Evaluation
+import stand_ins
+
+
+class TestTieredJudge(unittest.TestCase):
+    def setUp(self) -> None:
+        stand_ins.install()
+        self.full_judged = []
+        patches = [mock.patch('Evaluation.Evaluate_batch', self.full_judge),
+                   mock.patch.dict(Evaluation.tier_stats,
+                                   {'fast': 0, 'escalated': 0}),
+                   mock.patch('Evaluation.EMBEDDING_CALIBRATION',
+                              (0.0, 0.0, 0.0))]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def full_judge(self, questions, answers, contexts, batch_size=8,
+                   mode=None):
+        self.full_judged.extend(answers)
+        return [0.25] * len(answers)
+
+    def fast_scores(self, scores):
+        return mock.patch('Evaluation.embedding_scores',
+                          lambda questions, answers, contexts: list(scores))
+
+    def test_band_and_cannotanswer_escalate(self) -> None:
+        """Test that in-band scores and CANNOTANSWER go to the full judge."""
+        answers = ['a', 'b', 'CANNOTANSWER', 'd']
+        with self.fast_scores([0.9, 0.1, -0.9, -0.5]):
+            scores, escalated = Evaluation.evaluate_tiered_batch(
+                ['q'] * 4, answers, ['c'] * 4)
+        self.assertEqual(self.full_judged, ['b', 'CANNOTANSWER'])
+        self.assertEqual(scores, [0.9, 0.25, 0.25, -0.5])
+        self.assertEqual(escalated, [False, True, True, False])
+        self.assertEqual(Evaluation.tier_stats,
+                         {'fast': 2, 'escalated': 2})
+
+    def test_uncalibrated_escalates_everything(self) -> None:
+        """Test that without a calibration every sample is fully judged."""
+        with mock.patch('Evaluation.EMBEDDING_CALIBRATION', None):
+            scores, escalated = Evaluation.evaluate_tiered_batch(
+                ['q', 'q'], ['a', 'b'], ['c', 'c'])
+            with self.assertRaises(ValueError):
+                Evaluation.embedding_scores(['q'], ['a'], ['c'])
+        self.assertEqual(scores, [0.25, 0.25])
+        self.assertEqual(escalated, [True, True])
+
+    def test_calibration_fits_judge_scores(self) -> None:
+        """Test that the fitted map reproduces a linear judge."""
+        questions = ['Who wrote the notes?', 'When?', 'Where is Paris?',
+                     'Who?', 'What did Ada write?']
+        answers = ['Ada wrote the notes', 'in 1843', 'France',
+                   'Babbage', 'notes on the engine']
+        contexts = ['Ada wrote the notes in 1843 on the engine.'] * 5
+        qa, ac = Evaluation.embedding_similarities(questions, answers,
+                                                   contexts)
+        targets = list(0.3 * qa + 1.5 * ac - 0.8)
+        calibration = Evaluation.calibrate_embedding_judge(
+            questions, answers, contexts, judge_scores=targets)
+        self.assertEqual(Evaluation.EMBEDDING_CALIBRATION, calibration)
+        for fitted, expected in zip(calibration, (0.3, 1.5, -0.8)):
+            self.assertAlmostEqual(fitted, expected, places=4)
+
+    def test_report(self) -> None:
+        """Test the escalation rate and agreement of the tiered judge."""
+        with self.fast_scores([0.9, 0.1, -0.75, 0.75]):
+            report = Evaluation.tiered_judge_report(
+                ['q'] * 4, ['a', 'b', 'c', 'd'], ['c'] * 4)
+        self.assertEqual(report['samples'], 4)
+        self.assertEqual(report['escalation_rate'], 0.25)
+        self.assertAlmostEqual(report['fast_mae'], (0.65 + 1.0 + 0.5) / 3)
+        self.assertEqual(report['sign_agreement'], 0.75)
+
+
+if __name__ == '__main__':
+    unittest.main()
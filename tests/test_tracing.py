@@ -0,0 +1,38 @@
+import unittest
+import tracing
+
+
+class TestTracing(unittest.TestCase):
+    def test_span_is_no_op_when_off(self) -> None:
+        """Test that span records nothing without a trace or metrics."""
+        with tracing.span('stage') as stage:
+            pass
+        self.assertIsNone(stage)
+
+    def test_request_records_stages_and_runs_hooks(self) -> None:
+        """Test that spans inside a request land on its trace."""
+        seen = []
+        tracing.add_hook(seen.append)
+        trace = tracing.Trace()
+        try:
+            with tracing.request(trace):
+                with tracing.span('judge', tokens=12):
+                    pass
+        finally:
+            tracing._hooks.remove(seen.append)
+        self.assertEqual(trace.stages[0]['stage'], 'judge')
+        self.assertEqual(trace.stages[0]['tokens'], 12)
+        self.assertIsNotNone(trace.total_seconds)
+        self.assertEqual(seen, [trace])
+
+    def test_prometheus_text(self) -> None:
+        """Test that observed stages appear in the Prometheus dump."""
+        metrics = tracing.Metrics()
+        metrics.observe('flan', 0.02, tokens=7)
+        text = metrics.prometheus_text()
+        self.assertIn('qa_stage_seconds_count{stage="flan"} 1', text)
+        self.assertIn('qa_stage_tokens_total{stage="flan"} 7', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
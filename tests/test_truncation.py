@@ -0,0 +1,32 @@
+import unittest
+from stand_ins import StandInTokenizer
+from truncation import TruncationEngine
+
+
+class TestTruncationEngine(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = TruncationEngine(
+            {'short': StandInTokenizer(), 'long': StandInTokenizer()},
+            {'short': 6, 'long': 100})
+
+    def test_cuts_at_token_offset(self) -> None:
+        """Test that the context is cut after the last token that fits."""
+        context = 'one  two three, four five'
+        self.assertEqual(self.engine.truncate('short', context, 'q q'),
+                         'one  two three, four')
+
+    def test_per_model_budget(self) -> None:
+        """Test that each model is sized with its own limit."""
+        context = 'a b c d e f g h'
+        truncated = self.engine.truncate_all(context, 'q')
+        self.assertEqual(truncated['short'], 'a b c d e')
+        self.assertEqual(truncated['long'], context)
+
+    def test_tokenizes_each_context_once(self) -> None:
+        """Test that token offsets are cached per (model, context)."""
+        first = self.engine.token_ends('short', 'a b c')
+        self.assertIs(self.engine.token_ends('short', 'a b c'), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
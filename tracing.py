@@ -0,0 +1,192 @@
+"""
+Per-request stage tracing and aggregated metrics.
+
+A Trace passed to models.answer_question collects the duration and token
+count of every stage (truncation, each candidate model, each judge call)
+plus each candidate's raw score. Independently, enable_metrics() turns on
+process-wide counters and latency histograms that can be dumped in
+Prometheus text format, and add_hook() registers callbacks that receive
+every finished trace. With no trace and metrics off, span() is a no-op.
+"""
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Trace:
+    """
+    Timings, token counts and candidate scores for one request.
+    """
+
+    def __init__(self) -> None:
+        self.stages: List[Dict[str, Any]] = []
+        self.candidates: Dict[str, Dict[str, Any]] = {}
+        self.started = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float,
+               tokens: Optional[int] = None) -> None:
+        with self._lock:
+            self.stages.append({'stage': name, 'seconds': seconds,
+                                'tokens': tokens})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'stages': list(self.stages),
+                'candidates': dict(self.candidates),
+                'total_seconds': self.total_seconds}
+
+
+class Metrics:
+    """
+    Thread-safe stage counters and latency histograms.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self.buckets: Dict[str, List[int]] = {}
+
+    def observe(self, name: str, seconds: float,
+                tokens: Optional[int] = None) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            if tokens is not None:
+                self.tokens[name] = self.tokens.get(name, 0) + tokens
+            buckets = self.buckets.setdefault(name, [0] * len(BUCKETS))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+            self.seconds.clear()
+            self.tokens.clear()
+            self.buckets.clear()
+
+    def prometheus_text(self) -> str:
+        lines = ['# TYPE qa_stage_seconds histogram']
+        with self._lock:
+            for name in sorted(self.counts):
+                label = f'stage="{name}"'
+                for bound, count in zip(BUCKETS, self.buckets[name]):
+                    lines.append(
+                        f'qa_stage_seconds_bucket{{{label},le="{bound}"}} '
+                        f'{count}')
+                lines.append(f'qa_stage_seconds_bucket{{{label},le="+Inf"}} '
+                             f'{self.counts[name]}')
+                lines.append(f'qa_stage_seconds_sum{{{label}}} '
+                             f'{self.seconds[name]}')
+                lines.append(f'qa_stage_seconds_count{{{label}}} '
+                             f'{self.counts[name]}')
+            lines.append('# TYPE qa_stage_tokens_total counter')
+            for name in sorted(self.tokens):
+                lines.append(f'qa_stage_tokens_total{{stage="{name}"}} '
+                             f'{self.tokens[name]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+_metrics_enabled = False
+_hooks: List[Callable[[Trace], None]] = []
+_current: ContextVar[Optional[Trace]] = ContextVar('current_trace',
+                                                  default=None)
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    global _metrics_enabled
+    _metrics_enabled = enabled
+
+
+def add_hook(hook: Callable[[Trace], None]) -> None:
+    """
+    Registers a callback that receives every finished trace.
+    """
+    _hooks.append(hook)
+
+
+def active() -> bool:
+    """
+    True when the current stage would be recorded somewhere; callers use
+    this to skip work such as token counting when tracing is off.
+    """
+    return _metrics_enabled or _current.get() is not None
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+class _Span:
+    __slots__ = ('name', 'tokens', 'trace', 'started')
+
+    def __init__(self, name: str, tokens: Optional[int],
+                 trace: Optional[Trace]) -> None:
+        self.name = name
+        self.tokens = tokens
+        self.trace = trace
+
+    def __enter__(self) -> '_Span':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.started
+        if self.trace is not None:
+            self.trace.record(self.name, seconds, self.tokens)
+        if _metrics_enabled:
+            metrics.observe(self.name, seconds, self.tokens)
+
+
+_NO_OP = contextlib.nullcontext()
+
+
+def span(name: str, tokens: Optional[int] = None) -> Any:
+    """
+    Context manager timing one stage. Set .tokens on the returned span to
+    record a token count known only after the stage has run.
+    """
+    trace = _current.get()
+    if trace is None and not _metrics_enabled:
+        return _NO_OP
+    return _Span(name, tokens, trace)
+
+
+@contextlib.contextmanager
+def request(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """
+    Makes trace the current trace for the duration of one request and
+    hands it to the hooks when the request finishes.
+    """
+    if trace is None:
+        yield None
+        return
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.total_seconds = time.perf_counter() - trace.started
+        if _metrics_enabled:
+            metrics.observe('request', trace.total_seconds)
+        for hook in _hooks:
+            hook(trace)
+
+
+def count_tokens(tokenizer: Any, texts: List[str]) -> Optional[int]:
+    """
+    Total token count of texts, or None if the tokenizer cannot encode.
+    """
+    try:
+        return sum(len(tokenizer.encode(text)) for text in texts)
+    except Exception:
+        return None
@@ -0,0 +1,100 @@
+"""
+Offset-based context truncation.
+
+Each context is tokenized once per tokenizer with return_offsets_mapping,
+and the character offset where every token ends is cached. Truncating
+for a model is then a lookup: keep as many context tokens as fit in that
+model's budget after the question and special tokens, and cut the
+original text at the end offset of the last kept token. Nothing is
+decoded, and each model is sized with its own tokenizer and limit.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+import context_store
+import tracing
+
+
+class TruncationEngine:
+    """
+    Truncates contexts for several models, each with its own tokenizer
+    and token limit. Token end offsets are cached per (model, context)
+    in an LRU of max_entries, and read from the active context store when
+    it has them.
+    """
+
+    def __init__(self, tokenizers: Dict[str, Any],
+                 max_lengths: Dict[str, int],
+                 max_entries: int = 4096) -> None:
+        self.tokenizers = tokenizers
+        self.max_lengths = max_lengths
+        self.max_entries = max_entries
+        self._ends: 'OrderedDict[Tuple[str, str], np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token_ends(self, name: str, text: str) -> np.ndarray:
+        """
+        Character offset at which each token of text ends under the
+        tokenizer of model name, without special tokens.
+        """
+        key = (name, text)
+        with self._lock:
+            ends = self._ends.get(key)
+            if ends is not None:
+                self._ends.move_to_end(key)
+                return ends
+        store = context_store.active_store()
+        ends = store.token_ends(name, text) if store is not None else None
+        if ends is None:
+            encoding = self.tokenizers[name](text, add_special_tokens=False,
+                                             return_offsets_mapping=True)
+            ends = np.asarray([end for _, end in encoding['offset_mapping']],
+                              dtype=np.int32)
+        with self._lock:
+            self._ends[key] = ends
+            while len(self._ends) > self.max_entries:
+                self._ends.popitem(last=False)
+        return ends
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ends.clear()
+
+    def budget(self, name: str, question: str,
+               max_length: Optional[int] = None) -> int:
+        """
+        Number of context tokens that fit next to the question.
+        """
+        if max_length is None:
+            max_length = self.max_lengths[name]
+        tokenizer = self.tokenizers[name]
+        question_length = len(self.token_ends(name, question))
+        return max(0, max_length - question_length
+                   - tokenizer.num_special_tokens_to_add(pair=True))
+
+    def truncate(self, name: str, context: str, question: str,
+                 max_length: Optional[int] = None) -> str:
+        """
+        The longest prefix of context that fits model name's input
+        together with the question.
+        """
+        with tracing.span(f'truncate:{name}') as stage:
+            ends = self.token_ends(name, context)
+            budget = self.budget(name, question, max_length)
+            if stage is not None:
+                stage.tokens = min(budget, len(ends))
+            if budget >= len(ends):
+                return context
+            if budget == 0:
+                return ''
+            return context[:int(ends[budget - 1])].strip()
+
+    def truncate_all(self, context: str, question: str) -> Dict[str, str]:
+        """
+        context truncated for every model, keyed by model name.
+        """
+        return {name: self.truncate(name, context, question)
+                for name in self.tokenizers}